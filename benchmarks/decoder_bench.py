@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for the METAR/TAF decoder.
+
+Decodes a small corpus of real-world style reports, checks each one classifies
+to the expected flight rules, then times the decoder.
+
+Usage: python benchmarks/decoder_bench.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import decoder  # noqa: E402
+
+# (report, expected flight rules)
+METAR_CORPUS = [
+    ("METAR YSSY 170530Z 16012KT 9999 FEW030 22/14 Q1015 RF00.0/000.0", 'VFR'),
+    ("SPECI YMML 170542Z 16012G25KT 140V200 4000 1500SW -SHRA BR BKN008 SCT030CB 12/11 Q1009", 'IFR'),
+    ("METAR YBBN 170600Z AUTO 09008KT 9999 // NCD 27/18 Q1014", 'VFR'),
+    ("METAR YBAF 170000Z AUTO 00000KT 9999 // FEW011 BKN014 18/16 Q1017", 'MVFR'),
+    ("METAR YBAF 170030Z AUTO 00000KT 4000 // OVC004 17/16 Q1017", 'LIFR'),
+    ("METAR YSCB 170000Z 00000KT 0300 FG VV001 M02/M02 Q1025", 'LIFR'),
+    ("KSFO 171756Z 28012KT 10SM FEW010 SCT200 14/12 A2992 RMK AO2 SLP132", 'VFR'),
+    ("KSEA 171753Z 18006KT 1 1/2SM BR OVC004 09/08 A3001 RMK AO2", 'LIFR'),
+    ("KLAX 171753Z VRB03KT 4SM HZ BKN015 18/12 A2990", 'MVFR'),
+    ("KJFK 171751Z 31015G24KT 2SM -RA BR BKN007 OVC012 11/10 A2985", 'IFR'),
+    ("EGLL 171750Z AUTO 24010KT CAVOK 15/08 Q1020 NOSIG", 'VFR'),
+    ("EDDF 171750Z 24010KT 9999 R25L/P2000N FEW040 15/08 Q1020 BECMG FM1900 4000 BR", 'VFR'),
+]
+
+TAF_CORPUS = [
+    ("""TAF YSSY 170453Z 1706/1812
+16012KT 9999 FEW030
+FM170900 18015KT 9999 SCT025
+INTER 1710/1714 3000 SHRA BKN008
+BECMG 1720/1722 BKN020
+RMK T 20 19 17 16 Q 1015 1016 1017 1018""", 'VFR', 'IFR'),
+    ("""TAF KSFO 171720Z 1718/1824 28012KT P6SM FEW010
+  FM180300 29008KT P6SM SKC
+  FM181000 VRB04KT 3SM BR OVC006""", 'VFR', 'IFR'),
+    ("TAF EGLL 171700Z 1718/1824 24010KT CAVOK PROB30 TEMPO 1803/1807 0800 FG", 'VFR', 'LIFR'),
+]
+
+
+def check_corpus():
+    failures = []
+    for report, expected in METAR_CORPUS:
+        actual = decoder.decode_metar(report).flight_rules
+        if actual != expected:
+            failures.append(f"{report}: expected {expected}, got {actual}")
+
+    for report, expected, expected_worst in TAF_CORPUS:
+        taf = decoder.decode_taf(report)
+        if (taf.flight_rules, taf.worst_flight_rules) != (expected, expected_worst):
+            failures.append(f"{report.splitlines()[0]}: expected {expected}/{expected_worst}, "
+                            f"got {taf.flight_rules}/{taf.worst_flight_rules}")
+    return failures
+
+
+def main(iterations=2000):
+    failures = check_corpus()
+    if failures:
+        print("Corpus check failed:")
+        print("\n".join(failures))
+        sys.exit(1)
+
+    metar_time = timeit.timeit(lambda: [decoder.decode_metar(r) for r, _ in METAR_CORPUS], number=iterations)
+    taf_time = timeit.timeit(lambda: [decoder.decode_taf(r) for r, _, _ in TAF_CORPUS], number=iterations)
+
+    print(f"METAR decode: {metar_time / (iterations * len(METAR_CORPUS)) * 1e6:.1f} us/report")
+    print(f"TAF decode:   {taf_time / (iterations * len(TAF_CORPUS)) * 1e6:.1f} us/report")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,388 @@
+"""
+Offline benchmark for the bot's command handlers.
+
+Drives metar, taf, atis, brief, route, list_roles, add_role and on_member_join against
+fake Discord objects, with local stand-ins for the NAIPS SOAP endpoint and
+aviationweather.gov that replay the recorded responses in benchmarks/fixtures.
+Each scenario starts with empty caches and reports throughput, p50/p99 latency,
+upstream calls and Discord sends. No Discord token, NAIPS account or network
+access is needed.
+
+Usage: python benchmarks/replay_bench.py [--requests N] [--concurrency N]
+           [--upstream-latency MS] [--discord-latency MS] [--max-p99 MS]
+           [scenario ...]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, ROOT)
+
+GUILD_ID = 1000
+WELCOME_CHANNEL_ID = 2000
+COMMAND_CHANNEL_ID = 2001
+
+# Settings for the bot module, applied before it is imported
+BENCH_ENVIRONMENT = {
+    'AIRSERVICES_USERNAME': 'BENCH',
+    'AIRSERVICES_PASSWORD': 'bench',
+    'WELCOME_CHANNEL_ID': str(WELCOME_CHANNEL_ID),
+    'RULES_CHANNEL_ID': '2002',
+    'RULES_MESSAGE_ID': '3000',
+    'RESTRICTED_ROLES': 'Mod',
+    'WEATHER_CACHE_PATH': '',
+    'METRICS_PORT': '0',
+    'WATCH_STATIONS': '',
+    'WELCOME_BURST_WINDOW': '1',
+    # Measure the welcome path rather than raid handling
+    'RAID_JOIN_THRESHOLD': '1000000000',
+    'RAID_SIMILAR_THRESHOLD': '1000000000',
+}
+
+NAIPS_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:ns1="http://www.airservicesaustralia.com/naips/xsd">
+    <SOAP-ENV:Body>
+        <ns1:loc-brief-rsp>
+            <ns1:content>{content}</ns1:content>
+        </ns1:loc-brief-rsp>
+    </SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+def load_briefings():
+    directory = os.path.join(FIXTURES, 'briefings')
+    briefings = {}
+    for filename in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, filename), "r") as file:
+            briefings[filename.split('.')[0]] = file.read()
+    return briefings
+
+
+def load_reports(product):
+    """Reads recorded aviationweather.gov output into a dict of station to report."""
+    with open(os.path.join(FIXTURES, 'aviationweather', f'{product}.txt'), "r") as file:
+        lines = file.read().splitlines()
+
+    reports = {}
+    station = None
+    for line in lines:
+        if not line.strip():
+            continue
+        if line[0].isspace() and station:
+            reports[station] += "\n" + line
+            continue
+        words = line.split()
+        station = words[1] if words[0] == 'TAF' else words[0]
+        reports[station] = line
+    return reports
+
+
+class StubUpstreams:
+    """Local HTTP stand-ins for NAIPS and aviationweather.gov that count their calls."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.calls = Counter()
+        self.briefings = load_briefings()
+        self.reports = {product: load_reports(product) for product in ('metar', 'taf')}
+        self.runner = None
+        self.url = None
+
+    async def handle_naips(self, request):
+        self.calls['naips'] += 1
+        body = await request.text()
+        station = body.split('<ns1:loc>', 1)[1].split('<', 1)[0].strip()
+        await asyncio.sleep(self.latency)
+        content = self.briefings.get(station)
+        if content is None:
+            content = f"NO BRIEFING AVAILABLE FOR {station}"
+        return web.Response(text=NAIPS_RESPONSE.format(content=escape(content)), content_type='text/xml')
+
+    async def handle_aviationweather(self, request):
+        product = request.match_info['product']
+        self.calls[f'aviationweather/{product}'] += 1
+        await asyncio.sleep(self.latency)
+        stations = [station for station in request.query.get('ids', '').split(',') if station]
+        reports = [self.reports[product][station] for station in stations if station in self.reports[product]]
+        if not reports:
+            return web.Response(status=204)
+        return web.Response(text="\n".join(reports) + "\n")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/naips', self.handle_naips)
+        app.router.add_get('/api/data/{product}', self.handle_aviationweather)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        await web.SockSite(self.runner, sock).start()
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class FakeRole:
+    def __init__(self, role_id, name, position):
+        self.id = role_id
+        self.name = name
+        self.position = position
+        self.mention = f"<@&{role_id}>"
+
+    def is_default(self):
+        return self.position == 0
+
+    def __repr__(self):
+        return self.name
+
+
+class FakeMessage:
+    def __init__(self, message_id, content):
+        self.id = message_id
+        self.content = content
+
+
+class FakeChannel:
+    """A text channel that counts sends, optionally taking as long as a real API call."""
+
+    def __init__(self, channel_id, stats, latency=0):
+        self.id = channel_id
+        self.stats = stats
+        self.latency = latency
+
+    async def send(self, content=None, **kwargs):
+        self.stats['sends'] += 1
+        await asyncio.sleep(self.latency)
+        return FakeMessage(self.stats['sends'], content)
+
+
+class FakeGuild:
+    def __init__(self, stats, discord_latency=0):
+        self.id = GUILD_ID
+        self.name = "Benchmark Guild"
+        self.roles = [FakeRole(GUILD_ID, '@everyone', 0)] + [
+            FakeRole(GUILD_ID + position, name, position)
+            for position, name in enumerate(['Member', 'Student', 'PPL', 'CPL', 'ATC', 'RPC', 'Mod'], start=1)
+        ]
+        self.members = []
+        self.channels = {
+            channel_id: FakeChannel(channel_id, stats, discord_latency)
+            for channel_id in (WELCOME_CHANNEL_ID, COMMAND_CHANNEL_ID)
+        }
+        self.stats = stats
+        self.discord_latency = discord_latency
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class FakeMember:
+    _next_id = 10 ** 17
+
+    def __init__(self, guild, name=None):
+        FakeMember._next_id += 1
+        self.id = FakeMember._next_id
+        self.name = name or f"pilot{self.id}"
+        self.display_name = self.name
+        self.mention = f"<@{self.id}>"
+        self.guild = guild
+        self.roles = [guild.roles[0]]
+        self.created_at = datetime.now(timezone.utc) - timedelta(days=365)
+        self.joined_at = datetime.now(timezone.utc)
+
+    async def edit(self, roles, reason=None):
+        self.guild.stats['role_edits'] += 1
+        await asyncio.sleep(self.guild.discord_latency)
+        self.roles = [self.guild.roles[0]] + list(roles)
+
+    async def remove_roles(self, *roles):
+        self.guild.stats['role_edits'] += 1
+        await asyncio.sleep(self.guild.discord_latency)
+        self.roles = [role for role in self.roles if role not in roles]
+
+    def __str__(self):
+        return self.name
+
+
+class FakeContext:
+    _next_message_id = 0
+
+    def __init__(self, guild, content):
+        FakeContext._next_message_id += 1
+        self.guild = guild
+        self.author = FakeMember(guild)
+        self.channel = guild.get_channel(COMMAND_CHANNEL_ID)
+        self.message = FakeMessage(FakeContext._next_message_id, content)
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+def build_scenarios(pilot, guild):
+    australian = ['YSSY', 'YMML', 'YBBN', 'YSCB']
+    international = ['KSFO', 'KLAX', 'KJFK', 'EGLL']
+
+    def command(callback, make_args):
+        async def run():
+            args = make_args()
+            await callback.callback(callback.cog, FakeContext(guild, " ".join(args)), *args)
+        return run
+
+    weather = pilot.bot.get_cog('Weather')
+    roles = pilot.bot.get_cog('Roles')
+    moderation = pilot.bot.get_cog('Moderation')
+    welcome = pilot.bot.get_cog('Welcome')
+
+    async def join():
+        member = FakeMember(guild)
+        guild.members.append(member)
+        # Both cogs listen for joins, as when discord.py dispatches the event
+        await asyncio.gather(moderation.on_member_join(member), welcome.on_member_join(member))
+
+    async def add_role():
+        await roles.add_role(FakeContext(guild, "!roles add Student, PPL"), "Student, PPL")
+
+    return {
+        'metar': command(weather.metar, lambda: [random.choice(australian + international)]),
+        'metar-batch': command(weather.metar, lambda: random.sample(australian + international, 4)),
+        'taf': command(weather.taf, lambda: [random.choice(australian + international)]),
+        'atis': command(weather.atis, lambda: [random.choice(australian)]),
+        'brief': command(weather.brief, lambda: [random.choice(australian)]),
+        'route': command(weather.route, lambda: random.sample(australian + international, 3)),
+        'list_roles': command(roles.list_roles, lambda: []),
+        'add_role': add_role,
+        'on_member_join': join,
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+async def run_scenario(weather, stubs, guild, name, run, requests, concurrency):
+    # Every scenario starts cold, so the upstream counts include the initial misses
+    weather.briefing_cache.clear()
+    weather.report_cache.clear()
+    stubs.calls.clear()
+    guild.stats.clear()
+
+    latencies = []
+    errors = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await run()
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    if name == 'on_member_join':
+        # Let batched welcomes flush so their sends are counted
+        await asyncio.sleep(int(BENCH_ENVIRONMENT['WELCOME_BURST_WINDOW']) + 0.5)
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'requests': requests,
+        'throughput': requests / elapsed,
+        'p50': percentile(latencies, 0.5) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'upstream': sum(stubs.calls.values()),
+        'sends': guild.stats['sends'],
+        'errors': sum(errors.values()),
+        'error_types': dict(errors),
+    }
+
+
+async def main(args):
+    stubs = StubUpstreams(latency=args.upstream_latency / 1000)
+    await stubs.start()
+
+    os.environ.update(BENCH_ENVIRONMENT)
+    os.environ['AIRSERVICES_URL'] = f"{stubs.url}/naips"
+    os.environ['AVIATIONWEATHER_URL'] = f"{stubs.url}/api/data"
+    workdir = tempfile.mkdtemp(prefix='pilot-bench-')
+    with open(os.path.join(workdir, 'welcome_message.md'), "w") as file:
+        file.write("Welcome to the benchmark guild!")
+    os.chdir(workdir)
+
+    import bot as pilot
+    import upstream
+    import weather
+    logging.getLogger().setLevel(logging.WARNING)
+    # Commands live in extensions, which the bot would load on connecting
+    await pilot.bot.load_extensions()
+
+    stats = Counter()
+    guild = FakeGuild(stats, discord_latency=args.discord_latency / 1000)
+    scenarios = build_scenarios(pilot, guild)
+    selected = args.scenarios or list(scenarios)
+
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}. Choose from: {', '.join(scenarios)}")
+
+    results = []
+    try:
+        for name in selected:
+            results.append(await run_scenario(weather, stubs, guild, name, scenarios[name], args.requests, args.concurrency))
+    finally:
+        await upstream.close_all()
+        await stubs.stop()
+
+    print(f"{'scenario':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'upstream':>10}{'sends':>8}{'errors':>8}")
+    for result in results:
+        print(f"{result['scenario']:<16}{result['throughput']:>10.1f}{result['p50']:>10.2f}{result['p99']:>10.2f}"
+              f"{result['upstream']:>10}{result['sends']:>8}{result['errors']:>8}")
+        if result['error_types']:
+            print(f"    errors: {result['error_types']}")
+
+    failed = [result['scenario'] for result in results if result['errors']]
+    if args.max_p99 is not None:
+        failed += [result['scenario'] for result in results if result['p99'] > args.max_p99]
+    if failed:
+        print(f"Failed: {', '.join(sorted(set(failed)))}")
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help="Scenarios to run (default: all)")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once")
+    parser.add_argument('--upstream-latency', type=float, default=50, help="Simulated upstream latency (ms)")
+    parser.add_argument('--discord-latency', type=float, default=0, help="Simulated Discord API latency (ms)")
+    parser.add_argument('--max-p99', type=float, default=None, help="Fail if any scenario's p99 exceeds this (ms)")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for station selection")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    random.seed(arguments.seed)
+    asyncio.run(main(arguments))
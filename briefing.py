@@ -0,0 +1,119 @@
+import io
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+NAIPS_CONTENT_TAG = '{http://www.airservicesaustralia.com/naips/xsd}content'
+
+# A section header starts at the beginning of a line, e.g.
+#   TAF YSSY 170453Z 1706/1812
+#   TAF AMD YSSY 170710Z 1707/1812
+#   METAR YSSY 170530Z 16012KT ...
+#   SPECI YMML 170542Z ...
+#   ATIS YSSY D   170512
+#   NOTAM ...
+SECTION_HEADER = re.compile(
+    r'^(?P<kind>TAF(?: AMD| COR)?|METAR(?: COR)?|SPECI(?: COR)?|ATIS|NOTAMS?)\b'
+    r'(?:\s+(?P<station>[A-Z]{4})\b)?'
+    r'(?:\s+(?P<letter>[A-Z])\b)?'
+    r'(?:\s+(?P<issued>\d{6})Z?\b)?'
+)
+
+
+@dataclass
+class Section:
+    kind: str
+    station: str = None
+    issued: str = None  # DDHHMM (UTC)
+    letter: str = None  # ATIS information letter
+    lines: list = field(default_factory=list)
+
+    @property
+    def text(self):
+        return "\n".join(self.lines).rstrip()
+
+
+@dataclass
+class Briefing:
+    station: str
+    text: str
+    metars: list = field(default_factory=list)  # METAR and SPECI sections, in briefing order
+    taf: Section = None
+    atis: Section = None
+    notams: list = field(default_factory=list)
+    other: list = field(default_factory=list)
+    fetched_at: float = None  # Unix time the briefing was retrieved from NAIPS
+
+    @property
+    def metar_text(self):
+        return "\n".join(section.text for section in self.metars)
+
+    @property
+    def taf_text(self):
+        return self.taf.text if self.taf else ""
+
+    @property
+    def atis_text(self):
+        return self.atis.text if self.atis else ""
+
+    @property
+    def atis_letter(self):
+        return self.atis.letter if self.atis else None
+
+    @property
+    def latest_metar(self):
+        return self.metars[-1] if self.metars else None
+
+
+def extract_content(xml_text):
+    """
+    Pulls the briefing text out of a NAIPS SOAP response, stopping as soon as the
+    <content> element has been read rather than building the whole tree.
+    """
+    for _, element in ET.iterparse(io.BytesIO(xml_text.encode('utf-8')), events=('end',)):
+        if element.tag == NAIPS_CONTENT_TAG:
+            return element.text
+    return None
+
+
+def parse_briefing(text, station=None):
+    """
+    Splits a NAIPS location briefing into typed sections in a single pass.
+
+    A new section only begins when a recognised keyword appears at the very start
+    of a line, so body text mentioning 'ATIS' or 'TAF' never truncates a section.
+
+    :param text: The briefing text from the <content> element.
+    :param station: The ICAO code the briefing was requested for.
+    """
+    briefing = Briefing(station=station, text=text)
+    current = Section(kind='OTHER')
+    briefing.other.append(current)
+
+    for line in text.splitlines():
+        match = SECTION_HEADER.match(line)
+        if match:
+            kind = match.group('kind')
+            current = Section(
+                kind='NOTAM' if kind.startswith('NOTAM') else kind.split()[0],
+                station=match.group('station'),
+                issued=match.group('issued'),
+                letter=match.group('letter') if kind == 'ATIS' else None,
+            )
+
+            if current.kind in ('METAR', 'SPECI'):
+                briefing.metars.append(current)
+            elif current.kind == 'TAF':
+                # Keep the most recent TAF (an amendment supersedes the original)
+                briefing.taf = current
+            elif current.kind == 'ATIS':
+                briefing.atis = current
+            else:
+                briefing.notams.append(current)
+
+        current.lines.append(line)
+
+    # Drop unclassified sections that only held blank lines
+    briefing.other = [section for section in briefing.other if section.text.strip()]
+
+    return briefing
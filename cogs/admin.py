@@ -0,0 +1,101 @@
+import time
+import resource
+import discord
+from discord.ext import commands
+import settings
+from guild_config import GuildConfigStore, CONFIG_PARSERS
+
+
+class Admin(commands.Cog):
+    """Server settings (administrators), and bot statistics and extension reloading (bot owner)."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    # Command to view and change this guild's settings
+    @commands.command(name="config")
+    @commands.has_permissions(administrator=True)
+    async def config_command(self, ctx, action=None, key=None, *, value=None):
+        """
+        Handles !config, !config set <key> <value>, !config enable <command> and
+        !config disable <command>.
+        """
+        guild_configs = self.bot.guild_configs
+        config = guild_configs.get(ctx.guild.id)
+
+        if action is None:
+            await ctx.send(f"```{GuildConfigStore.describe(config)}```")
+            return
+
+        action = action.lower()
+        if action in ("enable", "disable") and key:
+            command = self.bot.get_command(key)
+            if command is None or command.name == "config":
+                await ctx.send(f"Unknown command '{key}'.")
+                return
+
+            disabled = [name for name in config.disabled_commands if name != command.name]
+            if action == "disable":
+                disabled.append(command.name)
+            guild_configs.update(ctx.guild.id, disabled_commands=disabled)
+            await ctx.send(f"Command '{command.name}' {action}d.")
+
+        elif action == "set" and key in CONFIG_PARSERS and value:
+            try:
+                parsed = CONFIG_PARSERS[key](value)
+            except ValueError:
+                await ctx.send(f"Invalid value for {key}: '{value}'.")
+                return
+            guild_configs.update(ctx.guild.id, **{key: parsed})
+            await ctx.send(f"Set {key} to {parsed}.")
+
+        else:
+            await ctx.send(f"Usage: `!config [set <{'|'.join(CONFIG_PARSERS)}> <value> | enable <command> | disable <command>]`")
+
+    # Command to report gateway event rates and memory use for the current runtime mode
+    # Stats cover the whole process (every guild), so only the bot's owner may see them
+    @commands.command(name="botstats")
+    @commands.is_owner()
+    async def botstats(self, ctx):
+        bot = self.bot
+        minutes = max((time.monotonic() - bot.started_at) / 60, 1 / 60)
+        total_events = sum(bot.gateway_events.values())
+        cached_members = sum(len(guild.members) for guild in bot.guilds)
+        # ru_maxrss is reported in kilobytes on Linux
+        peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        busiest = "\n".join(
+            f"• {event_type}: {count / minutes:.1f}/min" for event_type, count in bot.gateway_events.most_common(5)
+        )
+        startup = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in bot.startup_timings.items())
+
+        embed = discord.Embed(title="Bot Statistics", color=discord.Color.blue())
+        embed.description = (
+            f"Mode: **{settings.BOT_RUNTIME_MODE}** ({bot.shard_count or 1} shard(s))\n"
+            f"Intents: {', '.join(name for name, enabled in bot.intents if enabled)}\n"
+            f"Guilds: {len(bot.guilds)}, cached members: {cached_members}\n"
+            f"Peak memory: {peak_memory_mb:.1f} MB\n"
+            f"Startup: {startup or 'not ready yet'}\n"
+            f"Gateway events: {total_events / minutes:.1f}/min\n{busiest}"
+        )
+        await ctx.send(embed=embed)
+
+    # Command to reload command extensions in place, without reconnecting to Discord
+    # Reloading affects every guild, so only the bot's owner may do it
+    @commands.command(name="reload")
+    @commands.is_owner()
+    async def reload_extensions(self, ctx, *names):
+        names = names or settings.EXTENSIONS
+        reloaded = []
+        for name in names:
+            try:
+                await self.bot.reload_extension(f"cogs.{name}")
+            except commands.ExtensionError as e:
+                await ctx.send(f"Failed to reload '{name}': {e}")
+                return
+            reloaded.append(name)
+        await ctx.send(f"Reloaded {', '.join(reloaded)}.")
+
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
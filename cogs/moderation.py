@@ -0,0 +1,237 @@
+import logging
+from collections import OrderedDict
+import discord
+from discord.ext import commands
+import settings
+from moderation import MemberIndexes, parse_ban_targets, joined_within, ban_many
+from raid import RaidDetectors
+
+
+class Moderation(commands.Cog):
+    """Bans and raid detection. Every join passes through here before it is welcomed."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Per-guild member lookups by name and join time, for moderation
+        self.member_indexes = MemberIndexes()
+        self.raid_detectors = RaidDetectors(
+            window=settings.RAID_WINDOW,
+            join_threshold=settings.RAID_JOIN_THRESHOLD,
+            similar_threshold=settings.RAID_SIMILAR_THRESHOLD,
+            min_account_age=settings.RAID_MIN_ACCOUNT_AGE_DAYS * 24 * 3600,
+            cooldown=settings.RAID_COOLDOWN,
+            max_tracked=settings.RAID_MAX_TRACKED
+        )
+        # Joins already screened, so each is only counted once however many cogs ask
+        self.screened_joins = OrderedDict()
+
+    def raid_active(self, guild):
+        detector = self.raid_detectors.peek(guild.id)
+        return detector is not None and detector.check_cooldown()
+
+    async def screen_join(self, member):
+        """
+        Indexes a join and checks it for a raid, alerting moderators when one starts.
+        Each join is only screened once, whichever listener gets to it first.
+
+        :return: True if the member may be welcomed (no raid is in progress).
+        """
+        detector = self.raid_detectors.get(member.guild.id)
+        key = (member.guild.id, member.id, member.joined_at)
+        if key in self.screened_joins:
+            return not detector.active
+        self.screened_joins[key] = True
+        if len(self.screened_joins) > settings.RAID_MAX_TRACKED:
+            self.screened_joins.popitem(last=False)
+
+        index = self.member_indexes.peek(member.guild)
+        if index is not None:
+            index.add(member)
+
+        if detector.observe(member.id, member.name, member.created_at):
+            await self.alert_raid(member.guild, detector)
+        return not detector.active
+
+    # This event will trigger when a new member joins the server
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        await self.screen_join(member)
+
+    async def alert_raid(self, guild, detector):
+        logging.warning(f"Possible raid in {guild.name}: {len(detector.recent)} joins in {detector.window}s")
+        channel_id = self.bot.guild_configs.get(guild.id).mod_alert_channel_id
+        channel = guild.get_channel(channel_id) if channel_id else None
+        if channel is None:
+            return
+
+        embed = discord.Embed(title="Possible raid", color=discord.Color.red())
+        embed.description = (
+            f"{len(detector.recent)} members joined in the last {detector.window} seconds "
+            f"({len(detector.suspects)} suspect(s) so far). Welcomes are paused.\n"
+            f"Run `!raid` for details, `!raid ban confirm` to ban the suspects or `!raid end` to stand down."
+        )
+        try:
+            await channel.send(embed=embed)
+        except discord.HTTPException as e:
+            logging.warning(f"Could not send raid alert in {guild.name}: {e}")
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        index = self.member_indexes.peek(member.guild)
+        if index is not None:
+            index.remove(member)
+
+    # Username changes arrive as user updates (the member's copy of the user is shared)
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        if before.name == after.name:
+            return
+        for index in self.member_indexes.values():
+            index.rename(before.name, after)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.member_indexes.discard(guild.id)
+        self.raid_detectors.discard(guild.id)
+
+    # Command to ban one or more users
+    @commands.command(name="ban")
+    @commands.has_permissions(administrator=True)
+    @commands.has_role("Mod")
+    async def ban_user(self, ctx, *targets):
+        """
+        Bans users by ID, mention or username (!ban <user> [user ...]), or everyone
+        who joined in the last N minutes (!ban joined <minutes> confirm).
+        """
+        usage = "Usage: `!ban <user> [user ...]` or `!ban joined <minutes> confirm`"
+        if not targets:
+            await ctx.send(usage)
+            return
+
+        index = self.member_indexes.get(ctx.guild)
+        not_found = []
+
+        if targets[0].lower() == "joined":
+            try:
+                minutes = int(targets[1])
+            except (IndexError, ValueError):
+                await ctx.send(usage)
+                return
+
+            members = joined_within(index, minutes)
+            user_ids = [member.id for member in members]
+
+            # Criteria-based bans are previewed until confirmed
+            if len(targets) < 3 or targets[2].lower() != "confirm":
+                preview = ", ".join(member.name for member in members[:20])
+                if len(members) > 20:
+                    preview += f" and {len(members) - 20} more"
+                await ctx.send(
+                    f"{len(members)} member(s) joined in the last {minutes} minute(s): {preview or 'none'}.\n"
+                    f"Run `!ban joined {minutes} confirm` to ban them."
+                )
+                return
+        else:
+            user_ids, names = parse_ban_targets(targets)
+            for username in names:
+                matches = index.find(username)
+                if not matches:
+                    # Only recent joiners are cached, so ask the gateway for anyone else
+                    results = await ctx.guild.query_members(query=username, limit=5)
+                    matches = [member for member in results if member.name.lower() == username.lower()]
+
+                if len(matches) == 1:
+                    user_ids.append(matches[0].id)
+                elif matches:
+                    not_found.append(f"{username} (matches {len(matches)} users, use their ID)")
+                else:
+                    not_found.append(username)
+
+        # Never ban the moderator or the bot itself
+        user_ids = [user_id for user_id in user_ids if user_id not in (ctx.author.id, self.bot.user.id)]
+
+        if len(user_ids) > settings.MAX_BAN_TARGETS:
+            await ctx.send(f"Error: At most {settings.MAX_BAN_TARGETS} users can be banned at once.")
+            return
+
+        banned, failed = await ban_many(ctx.guild, user_ids, reason=f"Banned by {ctx.author} via !ban")
+
+        # Report everything in a single summary
+        if len(banned) == 1 and not failed and not not_found:
+            await ctx.send(f"User {banned[0]} has been banned.")
+            return
+
+        lines = [f"Banned {len(banned)} user(s)."]
+        if failed:
+            lines.append(f"Failed to ban {len(failed)}: {', '.join(str(user_id) for user_id in failed[:20])}")
+        if not_found:
+            lines.append(f"Not found: {', '.join(not_found[:20])}")
+        await ctx.send("\n".join(lines))
+
+    # Error handling for missing roles
+    @ban_user.error
+    async def ban_user_error(self, ctx, error):
+        if isinstance(error, commands.MissingAnyRole):
+            await ctx.send("You do not have the required roles to use this command.")
+        else:
+            await ctx.send("An error occurred while trying to ban the user.")
+
+    # Command to review and act on a detected raid
+    @commands.command(name="raid")
+    @commands.has_permissions(administrator=True)
+    @commands.has_role("Mod")
+    async def raid_command(self, ctx, action=None, confirm=None):
+        """
+        Handles !raid (status), !raid ban confirm (ban every suspect) and !raid end
+        (clear the suspects and resume welcomes).
+        """
+        detector = self.raid_detectors.get(ctx.guild.id)
+        active = detector.check_cooldown()
+        suspects = list(detector.suspects)
+
+        if action is None:
+            status = "in progress" if active else "not detected"
+            preview = ", ".join(f"<@{user_id}>" for user_id in suspects[:20])
+            if len(suspects) > 20:
+                preview += f" and {len(suspects) - 20} more"
+            await ctx.send(
+                f"Raid {status}. Join rate: {detector.join_rate:.1f}/min.\n"
+                f"{len(suspects)} suspect(s): {preview or 'none'}."
+            )
+            return
+
+        action = action.lower()
+        if action == "ban":
+            if not suspects:
+                await ctx.send("There are no raid suspects to ban.")
+                return
+            if (confirm or "").lower() != "confirm":
+                await ctx.send(f"Run `!raid ban confirm` to ban {len(suspects)} suspect(s).")
+                return
+
+            user_ids = [user_id for user_id in suspects if user_id not in (ctx.author.id, self.bot.user.id)]
+            banned, failed = await ban_many(ctx.guild, user_ids, reason=f"Raid suspect, banned by {ctx.author} via !raid")
+            detector.clear()
+
+            lines = [f"Banned {len(banned)} raid suspect(s)."]
+            if failed:
+                lines.append(f"Failed to ban {len(failed)}: {', '.join(str(user_id) for user_id in failed[:20])}")
+            await ctx.send("\n".join(lines))
+
+        elif action == "end":
+            detector.clear()
+            await ctx.send("Raid cleared, welcomes resumed.")
+
+        else:
+            await ctx.send("Usage: `!raid [ban confirm | end]`")
+
+    @raid_command.error
+    async def raid_command_error(self, ctx, error):
+        if isinstance(error, commands.MissingAnyRole):
+            await ctx.send("You do not have the required roles to use this command.")
+        else:
+            await ctx.send("An error occurred while handling the raid command.")
+
+
+async def setup(bot):
+    await bot.add_cog(Moderation(bot))
@@ -0,0 +1,107 @@
+import logging
+import discord
+from discord.ext import commands
+from roles import RoleIndexes, plan_role_additions
+
+
+class Roles(commands.Cog):
+    """Self-assigned roles."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Per-guild role lookups, built on first use and kept current by role events
+        self.role_indexes = RoleIndexes(lambda guild_id: bot.guild_configs.get(guild_id).restricted_roles)
+
+    async def cog_load(self):
+        self.bot.guild_configs.on_change(self.role_indexes.discard)
+
+    async def cog_unload(self):
+        self.bot.guild_configs.remove_listener(self.role_indexes.discard)
+
+    # Keep role indexes in step with the guild's roles
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        index = self.role_indexes.peek(role.guild)
+        if index is not None:
+            index.add(role)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        index = self.role_indexes.peek(after.guild)
+        if index is not None:
+            index.update(before, after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        index = self.role_indexes.peek(role.guild)
+        if index is not None:
+            index.remove(role)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.role_indexes.discard(guild.id)
+
+    # Command to list available roles
+    @commands.command(name="roles")
+    async def list_roles(self, ctx, action=None, *, role_name=None):
+        logging.info(f'Saw !roles from {ctx.author}')
+
+        if action is None:
+            # Create an embed to display roles
+            embed = discord.Embed(title="Available Roles", description="Here are the roles you can select:\n", color=discord.Color.blue())
+
+            # Roles (excluding restricted ones) pre-formatted as bullet points
+            role_list = self.role_indexes.get(ctx.guild).listing
+            embed.description += f"\n{role_list}"
+            embed.description += "\n\nUse `!roles add <name>` to select, or `!roles add <name>, <name>` for several."
+
+            # Send the embed
+            await ctx.send(embed=embed)
+
+        elif action.lower() == "add" and role_name:
+            await self.add_role(ctx, role_name)
+
+        elif action.lower() == "remove" and role_name:
+            await self.remove_role(ctx, role_name)
+
+    async def add_role(self, ctx, role_names):
+        """
+        Adds one or more comma-separated roles to the caller with a single role edit
+        and a single reply.
+        """
+        member = ctx.author
+        index = self.role_indexes.get(ctx.guild)
+        requested = [name.strip() for name in role_names.split(',') if name.strip()]
+
+        # Work out the final role set up front so it can be applied in one request
+        config = self.bot.guild_configs.get(ctx.guild.id)
+        desired_roles, lines = plan_role_additions(member.roles, requested, index, config)
+
+        if {role.id for role in desired_roles} != {role.id for role in member.roles}:
+            await member.edit(
+                roles=[role for role in desired_roles if not role.is_default()],
+                reason="Self-assigned via !roles add"
+            )
+
+        await ctx.send(f"{member.mention}\n" + "\n".join(lines))
+
+    # Helper function to remove a role
+    async def remove_role(self, ctx, role_name):
+        member = ctx.author
+        index = self.role_indexes.get(ctx.guild)
+        role = index.get(role_name)
+
+        if role is None or index.is_restricted(role):
+            await ctx.send(f"The role '{role_name}' cannot be removed.")
+            return
+
+        if role not in member.roles:
+            await ctx.send(f"You do not have the role '{role_name}'.")
+            return
+
+        await member.remove_roles(role)
+        await ctx.send(f"Removed role '{role_name}' from {member.mention}.")
+
+
+async def setup(bot):
+    await bot.add_cog(Roles(bot))
@@ -0,0 +1,371 @@
+from datetime import datetime, timezone
+from functools import cached_property
+import discord
+from discord.ext import commands
+import metrics
+import settings
+import upstream
+import weather
+from lazy import lazy_import
+from watcher import StationWatcher
+
+# pytz and the zone index are only loaded on the first !time
+timezones = lazy_import('timezones')
+
+
+class BriefingPages(discord.ui.View):
+    """
+    Previous/next buttons for a paginated briefing. Pages are planned up front but
+    only formatted when shown. Only the person who asked can turn them; anyone
+    else gets their own private copy.
+    """
+
+    def __init__(self, author, station, briefing, pages, timeout=300):
+        super().__init__(timeout=timeout)
+        self.author = author
+        self.station = station
+        self.briefing = briefing
+        self.pages = pages
+        self.index = 0
+        self.message = None
+        self.update_buttons()
+
+    def render(self):
+        return weather.render_briefing_page(self.station, self.briefing, self.pages, self.index, self.author.display_name)
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.index == len(self.pages) - 1
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author.id:
+            # Give anyone else their own private copy from the same briefing, rather
+            # than asking them to run !brief again (which would be deduplicated)
+            view = BriefingPages(interaction.user, self.station, self.briefing, self.pages, timeout=self.timeout)
+            view.index = self.index
+            view.update_buttons()
+            await interaction.response.send_message(embed=view.render(), view=view, ephemeral=True)
+            view.message = await interaction.original_response()
+            return False
+        return True
+
+    async def turn_to(self, interaction, index):
+        self.index = max(0, min(index, len(self.pages) - 1))
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self.turn_to(interaction, self.index - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        await self.turn_to(interaction, self.index + 1)
+
+    async def on_timeout(self):
+        # Leave the last page shown, without buttons that no longer respond
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+
+class Weather(commands.Cog):
+    """METAR, TAF, ATIS, briefing and time commands, and watched station announcements."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.station_watcher = StationWatcher(
+            [station for station in settings.WATCH_STATIONS if weather.is_australian_station(station)],
+            refresh=weather.refresh_watched_station,
+            describe_changes=weather.describe_briefing_changes,
+            on_change=self.announce_briefing_changes,
+            interval=settings.WATCH_INTERVAL,
+            # Refresh before the cached briefings expire (at the latest just after each METAR issue)
+            expires_in=weather.briefing_cache_ttl
+        )
+
+    async def cog_load(self):
+        # Keep watched stations warm in the briefing cache
+        self.station_watcher.start()
+
+    async def cog_unload(self):
+        self.station_watcher.stop()
+
+    @cached_property
+    def timezone_index(self):
+        # Names, abbreviations and aerodromes accepted by !time, indexed on first use
+        return timezones.TimezoneIndex()
+
+    async def announce_briefing_changes(self, station, briefing, changes):
+        if settings.WATCH_CHANNEL_ID is None:
+            return
+
+        channel = self.bot.get_channel(settings.WATCH_CHANNEL_ID)
+        if channel is None:
+            return
+
+        description = ""
+        if briefing.latest_metar:
+            description += f"{briefing.latest_metar.text}\n\n"
+        if any(change.startswith("ATIS") for change in changes):
+            description += briefing.atis_text
+
+        embed = discord.Embed(
+            title=f"{station}: {', '.join(changes)}",
+            description=description[:weather.EMBED_DESCRIPTION_LIMIT],
+            color=discord.Color.orange()
+        )
+        await channel.send(embed=embed)
+
+    def get_current_time_in_timezone(self, timezone_id: str) -> str:
+        """
+        Returns the current time in the specified timezone.
+
+        :param timezone_id: A timezone, city, abbreviation, UTC offset or aerodrome (e.g., 'Australia/Hobart', 'Sydney', 'AEST', '+08:00', 'YSSY', 'Zulu').
+        :return: The current time as a string in the format 'YYYY-MM-DD HH:MM:SS TZ'.
+        """
+        resolved = self.timezone_index.resolve(timezone_id)
+        if resolved is None:
+            if timezone_id.startswith('+') or timezone_id.startswith('-'):
+                return "Invalid UTC offset format."
+            return "Invalid timezone ID."
+
+        _, tz = resolved
+        return datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S %Z')
+
+    @commands.command(name='time')
+    async def time_command(self, ctx, *timezone_ids: str):
+        """
+        Handles the !time command by returning the current time in one or more timezones.
+
+        :param timezone_ids: The timezones provided by the user (e.g., 'Australia/Hobart', '+8', 'Zulu YSSY KLAX').
+        """
+        timezone_ids = timezone_ids or ("Zulu",)
+        if len(timezone_ids) == 1:
+            time_in_tz = self.get_current_time_in_timezone(timezone_ids[0])
+            await ctx.send(f"The current time in {timezone_ids[0]} is: {time_in_tz}")
+            return
+
+        # All zones are rendered from the same instant, in a single reply
+        now = datetime.now(timezone.utc)
+        lines = []
+        for timezone_id in timezone_ids[:settings.MAX_TIME_ZONES]:
+            resolved = self.timezone_index.resolve(timezone_id)
+            if resolved is None:
+                lines.append(f"{timezone_id}: Invalid timezone ID.")
+                continue
+            label, tz = resolved
+            lines.append(f"{label}: {now.astimezone(tz).strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        await ctx.send("```" + "\n".join(lines) + "```")
+
+    async def send_station_table(self, ctx, product, stations):
+        if len(stations) > settings.MAX_BATCH_STATIONS:
+            await ctx.send(f"Error: At most {settings.MAX_BATCH_STATIONS} stations can be requested at once.")
+            return
+
+        reports = await weather.fetch_station_reports(product, stations)
+        await ctx.send(embed=weather.station_table_embed(product, stations, reports))
+
+    @commands.command()
+    async def route(self, ctx, *stations: str):
+        """Handles !route by summarising current and forecast weather at every station on a route."""
+        stations = weather.parse_station_list(stations)
+        if not stations:
+            await ctx.send("Usage: `!route <station> <station> [station ...]` (e.g. `!route YMML YSCB YSSY`)")
+            return
+
+        if len(stations) > settings.MAX_BATCH_STATIONS:
+            await ctx.send(f"Error: At most {settings.MAX_BATCH_STATIONS} stations can be requested at once.")
+            return
+
+        # Every station is fetched at once, so the reply waits on the slowest upstream only
+        metars, tafs = await weather.fetch_route_reports(stations)
+        await ctx.send(embed=weather.route_embed(stations, metars, tafs))
+
+    @commands.command()
+    async def brief(self, ctx, station: str):
+        # Check if the station starts with 'Y' (for Australian airports)
+        if not station.lower().startswith('y') or len(station) != 4:
+            await ctx.send("Error: Only Australian airports (starting with 'Y') are supported.")
+            return
+
+        try:
+            # Make the SOAP request to the AirServices API
+            status, briefing = await weather.fetch_airservices_briefing(station)
+
+            # Check if the request was successful
+            if status == 200:
+                if briefing is not None:
+                    # Long briefings (busy aerodromes with many NOTAMs) are paginated
+                    pages = weather.plan_briefing_pages(briefing)
+                    if len(pages) == 1:
+                        await ctx.send(embed=weather.render_briefing_page(station, briefing, pages, 0, ctx.author.display_name))
+                        return
+
+                    view = BriefingPages(ctx.author, station, briefing, pages)
+                    view.message = await ctx.send(embed=view.render(), view=view)
+                else:
+                    await ctx.send("Error: Unable to retrieve briefing content.")
+            else:
+                # Handle non-200 responses
+                await ctx.send(f"Error: Could not retrieve briefing for {station.upper()}. (HTTP {status})")
+
+        except upstream.UpstreamError as e:
+            # Handle request exceptions (like timeouts or connectivity issues)
+            await ctx.send(f"Error: Failed to retrieve briefing data due to network issue. {e}")
+
+    @commands.command()
+    async def metar(self, ctx, *stations: str):
+        stations = weather.parse_station_list(stations)
+        if not stations:
+            await ctx.send("Usage: `!metar <station> [station ...]`")
+            return
+
+        # Several stations (or a route like YMML-YSCB-YSSY) are shown together
+        if len(stations) > 1:
+            await self.send_station_table(ctx, 'metar', stations)
+            return
+
+        station = stations[0]
+        if not weather.is_australian_station(station):
+            # Handle non-Australian stations
+            try:
+                status, reports = await weather.fetch_aviationweather_reports('metar', [station])
+
+                if status == 200:
+                    if station not in reports:
+                        await ctx.send("Error: Unable to retrieve METAR data.")
+                        return
+
+                    metar_data, fetched_at = reports[station]
+
+                    # Decode the most recent report
+                    with metrics.phase('parse'):
+                        report = weather.decoder.decode_metar(metar_data)
+
+                    # Determine flight rules and embed color
+                    flight_rules, color = weather.determine_flight_rules(report)
+
+                    embed = discord.Embed(
+                        title=f"METAR for {station.upper()}",
+                        description=f"{weather.stale_notice(fetched_at)}{metar_data}\n\nFlight Conditions: **{flight_rules}**",
+                        color=color
+                    )
+                    await ctx.send(embed=embed)
+                else:
+                    await ctx.send(f"Error: Could not retrieve METAR for {station.upper()}. (HTTP {status})")
+
+            except upstream.UpstreamError as e:
+                await ctx.send(f"Error: Failed to retrieve METAR data due to network issue. {e}")
+            return
+
+        try:
+            status, briefing = await weather.fetch_airservices_briefing(station)
+            if status == 200:
+                if briefing is not None:
+                    # Only METAR and optional SPECI sections
+                    metar_section = briefing.metar_text
+
+                    # Decode the most recent METAR/SPECI
+                    latest = briefing.latest_metar
+                    with metrics.phase('parse'):
+                        report = weather.decoder.decode_metar(latest.text) if latest else None
+
+                    # Determine flight rules and embed color
+                    flight_rules, color = weather.determine_flight_rules(report)
+
+                    embed = discord.Embed(title=f"METAR for {station.upper()}", description=f"{weather.stale_notice(briefing.fetched_at)}{metar_section}\n\nFlight Conditions: **{flight_rules}**", color=color)
+                    await ctx.send(embed=embed)
+                else:
+                    await ctx.send("Error: Unable to retrieve METAR data.")
+            else:
+                await ctx.send(f"Error: Could not retrieve METAR for {station.upper()}. (HTTP {status})")
+
+        except upstream.UpstreamError as e:
+            await ctx.send(f"Error: Failed to retrieve METAR data due to network issue. {e}")
+
+    @commands.command()
+    async def taf(self, ctx, *stations: str):
+        stations = weather.parse_station_list(stations)
+        if not stations:
+            await ctx.send("Usage: `!taf <station> [station ...]`")
+            return
+
+        # Several stations (or a route like YMML-YSCB-YSSY) are shown together
+        if len(stations) > 1:
+            await self.send_station_table(ctx, 'taf', stations)
+            return
+
+        station = stations[0]
+        if not weather.is_australian_station(station):
+            # Handle non-Australian stations
+            try:
+                status, reports = await weather.fetch_aviationweather_reports('taf', [station])
+
+                if status == 200:
+                    if station not in reports:
+                        await ctx.send("Error: Unable to retrieve TAF data.")
+                        return
+
+                    # Decode the forecast and classify each period
+                    taf_data, fetched_at = reports[station]
+                    description, color = weather.taf_description(taf_data)
+                    description = weather.stale_notice(fetched_at) + description
+
+                    embed = discord.Embed(
+                        title=f"TAF for {station.upper()}",
+                        description=description,
+                        color=color
+                    )
+                    await ctx.send(embed=embed)
+                else:
+                    await ctx.send(f"Error: Could not retrieve TAF for {station.upper()}. (HTTP {status})")
+            except upstream.UpstreamError as e:
+                await ctx.send(f"Error: Failed to retrieve TAF data due to network issue. {e}")
+            return
+
+        try:
+            status, briefing = await weather.fetch_airservices_briefing(station)
+            if status == 200:
+                if briefing is not None:
+                    # Decode the forecast and classify each period
+                    description, color = weather.taf_description(briefing.taf_text)
+                    description = weather.stale_notice(briefing.fetched_at) + description
+
+                    embed = discord.Embed(title=f"TAF for {station.upper()}", description=description, color=color)
+                    await ctx.send(embed=embed)
+                else:
+                    await ctx.send("Error: Unable to retrieve TAF data.")
+            else:
+                await ctx.send(f"Error: Could not retrieve TAF for {station.upper()}. (HTTP {status})")
+
+        except upstream.UpstreamError as e:
+            await ctx.send(f"Error: Failed to retrieve TAF data due to network issue. {e}")
+
+    @commands.command()
+    async def atis(self, ctx, station: str):
+        if not station.lower().startswith('y') or len(station) != 4:
+            await ctx.send("Error: Only Australian airports (starting with 'Y') are supported.")
+            return
+
+        try:
+            status, briefing = await weather.fetch_airservices_briefing(station)
+            if status == 200:
+                if briefing is not None:
+                    atis_text = weather.stale_notice(briefing.fetched_at) + briefing.atis_text
+
+                    embed = discord.Embed(title=f"ATIS for {station.upper()}", description=atis_text, color=discord.Color.orange())
+                    await ctx.send(embed=embed)
+                else:
+                    await ctx.send("Error: Unable to retrieve ATIS data.")
+            else:
+                await ctx.send(f"Error: Could not retrieve ATIS for {station.upper()}. (HTTP {status})")
+
+        except upstream.UpstreamError as e:
+            await ctx.send(f"Error: Failed to retrieve ATIS data due to network issue. {e}")
+
+
+async def setup(bot):
+    await bot.add_cog(Weather(bot))
@@ -0,0 +1,123 @@
+import logging
+import discord
+from discord.ext import commands
+import settings
+from welcome import WelcomeTemplate, JoinBatcher
+
+
+class Welcome(commands.Cog):
+    """Welcome messages for new members."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Welcome messages loaded from .md files, reloaded when a file changes
+        self.welcome_templates = {}
+        # Resolved welcome channels and rules links, per guild
+        self.welcome_channels = {}
+        self.rules_links = {}
+        self.join_batcher = JoinBatcher(
+            self.send_welcome,
+            self.send_batched_welcome,
+            window=settings.WELCOME_BURST_WINDOW,
+            threshold=settings.WELCOME_BURST_THRESHOLD
+        )
+
+    async def cog_load(self):
+        self.bot.guild_configs.on_change(self.forget_guild)
+
+    async def cog_unload(self):
+        self.bot.guild_configs.remove_listener(self.forget_guild)
+
+    def forget_guild(self, guild_id):
+        # Anything derived from a guild's config is rebuilt on next use
+        self.welcome_channels.pop(guild_id, None)
+        self.rules_links.pop(guild_id, None)
+
+    def get_rules_link(self, guild):
+        # Link to rules
+        message_link = self.rules_links.get(guild.id)
+        if message_link is None:
+            config = self.bot.guild_configs.get(guild.id)
+            message_link = f"https://discord.com/channels/{guild.id}/{config.rules_channel_id}/{config.rules_message_id}"
+            self.rules_links[guild.id] = message_link
+
+        return message_link
+
+    def get_welcome_channel(self, guild):
+        channel = self.welcome_channels.get(guild.id)
+        if channel is None:
+            channel_id = self.bot.guild_configs.get(guild.id).welcome_channel_id
+            channel = guild.get_channel(int(channel_id)) if channel_id else None
+            if channel is not None:
+                self.welcome_channels[guild.id] = channel
+        return channel
+
+    def get_welcome_template(self, guild):
+        path = self.bot.guild_configs.get(guild.id).welcome_message_file
+        template = self.welcome_templates.get(path)
+        if template is None:
+            template = self.welcome_templates[path] = WelcomeTemplate(path)
+        return template
+
+    def get_welcome_message(self, guild, users):
+        mentions = ", ".join(user.mention for user in users)
+
+        embed = discord.Embed(title="", description=f"Hey {mentions}!", color=discord.Color.green())
+        embed.description += f"\n\n{self.get_welcome_template(guild).get()}"
+        embed.description += f"\n\nMake sure to read our rules before you dive in: {self.get_rules_link(guild)}"
+
+        return embed
+
+    async def send_welcome(self, member):
+        welcome_channel = self.get_welcome_channel(member.guild)
+        if welcome_channel is None:
+            return
+
+        await welcome_channel.send(embed=self.get_welcome_message(member.guild, [member]))
+
+    async def send_batched_welcome(self, guild, members):
+        welcome_channel = self.get_welcome_channel(guild)
+        if welcome_channel is None:
+            return
+
+        # Don't welcome anyone queued before a raid was detected
+        moderation = self.bot.get_cog('Moderation')
+        if moderation is not None and moderation.raid_active(guild):
+            logging.info(f"Skipped batched welcome for {len(members)} members during a raid in {guild.name}")
+            return
+
+        # One embed per chunk keeps the mention list within Discord's length limits
+        for start in range(0, len(members), settings.WELCOME_BATCH_MAX_MENTIONS):
+            chunk = members[start:start + settings.WELCOME_BATCH_MAX_MENTIONS]
+            await welcome_channel.send(embed=self.get_welcome_message(guild, chunk))
+
+    # This event will trigger when a new member joins the server
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        # No welcomes while a raid is in progress (when the moderation cog is loaded)
+        moderation = self.bot.get_cog('Moderation')
+        if moderation is not None and not await moderation.screen_join(member):
+            return
+
+        # Welcomes are sent straight away, or coalesced during a join burst
+        await self.join_batcher.add(member)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        # Forget a deleted welcome channel so it is resolved again next time
+        if self.welcome_channels.get(channel.guild.id) == channel:
+            del self.welcome_channels[channel.guild.id]
+
+    # Manually invoke the above
+    @commands.command(name="welcome")
+    @commands.guild_only()
+    async def welcome_message(self, ctx):
+        # Welcome messages are per guild, so there's nothing to show in DMs
+        embed = self.get_welcome_message(ctx.guild, [ctx.author])
+
+        # Send the embed
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Welcome(bot))
@@ -0,0 +1,520 @@
+import re
+from dataclasses import dataclass, field, fields
+
+# Metres per statute mile
+METRES_PER_SM = 1609.34
+
+# Visibility reported as 9999 means 10km or more
+MAX_VISIBILITY_M = 10000
+
+# Flight rules, ordered from best to worst
+FLIGHT_RULES = ('VFR', 'MVFR', 'IFR', 'LIFR')
+
+# Precompiled token patterns
+WIND = re.compile(r'^(?P<dir>\d{3}|VRB|///)(?P<speed>P?\d{2,3}|//)(?:G(?P<gust>P?\d{2,3}))?(?P<unit>KT|MPS|KMH)$')
+WIND_VARIATION = re.compile(r'^(?P<from>\d{3})V(?P<to>\d{3})$')
+VIS_METRES = re.compile(r'^(?P<vis>\d{4})(?:NDV|[NSEW]{1,2})?$')
+VIS_SM = re.compile(r'^(?P<less>[PM])?(?:(?P<whole>\d{1,2})|(?P<num>\d)/(?P<den>\d{1,2}))SM$')
+VIS_KM = re.compile(r'^(?P<vis>\d{1,2})KM$')
+WHOLE_NUMBER = re.compile(r'^\d$')
+RVR = re.compile(r'^R(?P<runway>\d{2}[LRC]?)/(?P<low>[PM]?\d{4})(?:V(?P<high>[PM]?\d{4}))?(?:FT)?/?(?P<trend>[UDN])?$')
+WEATHER = re.compile(
+    r'^(?P<intensity>[-+]|VC)?(?P<descriptor>MI|PR|BC|DR|BL|SH|TS|FZ)?'
+    r'(?P<phenomena>(?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|PO|SQ|FC|SS|DS)+)?$'
+)
+CLOUD = re.compile(r'^(?P<cover>FEW|SCT|BKN|OVC)(?P<height>\d{3}|///)(?P<type>CB|TCU|///)?$')
+VERTICAL_VISIBILITY = re.compile(r'^VV(?P<height>\d{3}|///)$')
+NO_CLOUD = frozenset(('NSC', 'NCD', 'SKC', 'CLR'))
+TEMPERATURE = re.compile(r'^(?P<temp>M?\d{2})/(?P<dew>M?\d{2})?$')
+QNH = re.compile(r'^Q(?P<qnh>\d{4})$')
+ALTIMETER = re.compile(r'^A(?P<alt>\d{4})$')
+STATION = re.compile(r'^[A-Z]{4}$')
+ISSUE_TIME = re.compile(r'^(?P<time>\d{6})Z$')
+PERIOD = re.compile(r'^(?P<start>\d{4})/(?P<end>\d{4})$')
+FROM_GROUP = re.compile(r'^FM(?P<time>\d{6})$')
+PROB_GROUP = re.compile(r'^PROB(?P<prob>\d{2})$')
+TREND_TIME = re.compile(r'^(?P<kind>FM|TL|AT)(?P<time>\d{4})$')
+CHANGE_KEYWORDS = frozenset(('BECMG', 'TEMPO', 'INTER'))
+
+
+@dataclass
+class Wind:
+    direction: int = None  # None when variable (VRB)
+    speed: int = None
+    gust: int = None
+    unit: str = 'KT'
+    variable_from: int = None
+    variable_to: int = None
+
+
+@dataclass
+class RunwayVisualRange:
+    runway: str
+    low: str
+    high: str = None
+    trend: str = None
+
+
+@dataclass
+class CloudLayer:
+    cover: str
+    height: int = None  # feet above aerodrome level
+    type: str = None
+
+
+@dataclass
+class Conditions:
+    """A set of observed or forecast conditions."""
+    wind: Wind = None
+    visibility: float = None  # metres
+    cavok: bool = None
+    rvr: list = field(default_factory=list)
+    weather: list = field(default_factory=list)
+    clouds: list = field(default_factory=list)
+    vertical_visibility: int = None  # feet
+
+    @property
+    def ceiling(self):
+        """The lowest broken or overcast layer (or vertical visibility) in feet, None if unlimited."""
+        heights = [layer.height for layer in self.clouds if layer.cover in ('BKN', 'OVC') and layer.height is not None]
+        if self.vertical_visibility is not None:
+            heights.append(self.vertical_visibility)
+        return min(heights) if heights else None
+
+    @property
+    def flight_rules(self):
+        return classify_flight_rules(self.visibility, self.ceiling)
+
+
+@dataclass
+class ChangeGroup(Conditions):
+    kind: str = None  # FM, BECMG, TEMPO, INTER, PROB30 TEMPO etc.
+    start: str = None
+    end: str = None
+    probability: int = None
+
+
+@dataclass
+class Metar(Conditions):
+    raw: str = None
+    kind: str = 'METAR'
+    station: str = None
+    time: str = None
+    auto: bool = False
+    temperature: int = None
+    dewpoint: int = None
+    qnh: int = None  # hPa
+    altimeter: float = None  # inHg
+    trends: list = field(default_factory=list)
+    remarks: str = None
+
+
+@dataclass
+class Taf:
+    raw: str = None
+    station: str = None
+    time: str = None
+    valid_from: str = None
+    valid_to: str = None
+    amended: bool = False
+    base: ChangeGroup = None
+    changes: list = field(default_factory=list)
+    remarks: str = None
+
+    def periods(self):
+        """
+        Yields (change group, effective conditions) for the base forecast and each
+        change group. FM groups replace the prevailing forecast while BECMG, TEMPO,
+        INTER and PROB groups only override the elements they mention.
+        """
+        prevailing = self.base
+        yield self.base, self.base
+
+        for change in self.changes:
+            if change.kind == 'FM':
+                prevailing = change
+                yield change, change
+                continue
+
+            effective = merge_conditions(prevailing, change)
+            if change.kind == 'BECMG':
+                prevailing = effective
+            yield change, effective
+
+    @property
+    def flight_rules(self):
+        return self.base.flight_rules if self.base else 'Unknown'
+
+    @property
+    def worst_flight_rules(self):
+        return worst_flight_rules(effective.flight_rules for _, effective in self.periods())
+
+
+def classify_flight_rules(visibility, ceiling):
+    """
+    Classifies conditions as VFR, MVFR, IFR or LIFR.
+
+    :param visibility: Visibility in metres.
+    :param ceiling: Ceiling in feet, or None if there is no ceiling.
+    """
+    if visibility is None:
+        return 'Unknown'
+
+    vis_sm = visibility / METRES_PER_SM
+    ceiling = float('inf') if ceiling is None else ceiling
+
+    if vis_sm >= 5 and ceiling >= 3000:
+        return 'VFR'
+    elif vis_sm >= 3 and ceiling >= 1000:
+        return 'MVFR'
+    elif vis_sm >= 1 and ceiling >= 500:
+        return 'IFR'
+    return 'LIFR'
+
+
+def worst_flight_rules(rules):
+    worst = 'Unknown'
+    for rule in rules:
+        if rule in FLIGHT_RULES and (worst not in FLIGHT_RULES or FLIGHT_RULES.index(rule) > FLIGHT_RULES.index(worst)):
+            worst = rule
+    return worst
+
+
+def merge_conditions(prevailing, change):
+    """Overlays the elements reported in a change group onto the prevailing conditions."""
+    merged = ChangeGroup(kind=change.kind, start=change.start, end=change.end, probability=change.probability)
+    for attribute in fields(Conditions):
+        name = attribute.name
+        value = getattr(change, name)
+        if value is None or value == []:
+            value = getattr(prevailing, name)
+        setattr(merged, name, value)
+
+    # A change to CAVOK or a new cloud group clears the previous layers
+    if change.cavok:
+        merged.clouds = []
+        merged.vertical_visibility = None
+    elif change.clouds or change.vertical_visibility is not None:
+        merged.clouds = change.clouds
+        merged.vertical_visibility = change.vertical_visibility
+    return merged
+
+
+def _parse_visibility_sm(match, whole=None):
+    if match.group('whole'):
+        miles = int(match.group('whole'))
+    else:
+        miles = int(match.group('num')) / int(match.group('den'))
+    if whole is not None:
+        miles += whole
+    return miles * METRES_PER_SM
+
+
+def _parse_temperature(value):
+    if value is None:
+        return None
+    return -int(value[1:]) if value.startswith('M') else int(value)
+
+
+def _decode_conditions(tokens, index, target, stop):
+    """
+    Consumes condition tokens (wind, visibility, weather, cloud...) into `target`,
+    returning the index of the first token that isn't a condition or that `stop`
+    recognises as the start of the next group.
+    """
+    count = len(tokens)
+    while index < count:
+        token = tokens[index]
+        if stop(token):
+            break
+
+        match = WIND.match(token)
+        if match and target.wind is None:
+            direction = match.group('dir')
+            speed = match.group('speed')
+            gust = match.group('gust')
+            target.wind = Wind(
+                direction=int(direction) if direction.isdigit() else None,
+                speed=int(speed.lstrip('P')) if speed != '//' else None,
+                gust=int(gust.lstrip('P')) if gust else None,
+                unit=match.group('unit'),
+            )
+            index += 1
+            continue
+
+        match = WIND_VARIATION.match(token)
+        if match and target.wind is not None:
+            target.wind.variable_from = int(match.group('from'))
+            target.wind.variable_to = int(match.group('to'))
+            index += 1
+            continue
+
+        if token == 'CAVOK':
+            target.cavok = True
+            target.visibility = MAX_VISIBILITY_M
+            index += 1
+            continue
+
+        if target.visibility is None:
+            match = VIS_METRES.match(token)
+            if match:
+                visibility = int(match.group('vis'))
+                target.visibility = MAX_VISIBILITY_M if visibility == 9999 else visibility
+                index += 1
+                continue
+
+            # Whole and fractional statute miles may be split, e.g. "1 1/2SM"
+            if WHOLE_NUMBER.match(token) and index + 1 < count:
+                match = VIS_SM.match(tokens[index + 1])
+                if match and match.group('num'):
+                    target.visibility = _parse_visibility_sm(match, whole=int(token))
+                    index += 2
+                    continue
+
+            match = VIS_SM.match(token)
+            if match:
+                target.visibility = _parse_visibility_sm(match)
+                index += 1
+                continue
+
+            match = VIS_KM.match(token)
+            if match:
+                target.visibility = int(match.group('vis')) * 1000
+                index += 1
+                continue
+
+        elif VIS_METRES.match(token):
+            # Minimum directional visibility, e.g. "4000 1500SW"
+            index += 1
+            continue
+
+        if token in ('//', '///'):
+            # Present weather not observed (automatic stations)
+            index += 1
+            continue
+
+        match = RVR.match(token)
+        if match:
+            target.rvr.append(RunwayVisualRange(
+                runway=match.group('runway'),
+                low=match.group('low'),
+                high=match.group('high'),
+                trend=match.group('trend'),
+            ))
+            index += 1
+            continue
+
+        match = CLOUD.match(token)
+        if match:
+            height = match.group('height')
+            cloud_type = match.group('type')
+            target.clouds.append(CloudLayer(
+                cover=match.group('cover'),
+                height=int(height) * 100 if height.isdigit() else None,
+                type=cloud_type if cloud_type != '///' else None,
+            ))
+            index += 1
+            continue
+
+        match = VERTICAL_VISIBILITY.match(token)
+        if match:
+            height = match.group('height')
+            target.vertical_visibility = int(height) * 100 if height.isdigit() else 0
+            index += 1
+            continue
+
+        if token in NO_CLOUD:
+            index += 1
+            continue
+
+        if token == 'NSW':
+            target.weather.append(token)
+            index += 1
+            continue
+
+        match = WEATHER.match(token)
+        if match and (match.group('phenomena') or match.group('descriptor')):
+            target.weather.append(token)
+            index += 1
+            continue
+
+        break
+
+    return index
+
+
+def _tokenise(text):
+    return text.replace('=', ' ').split()
+
+
+def _is_change_start(token):
+    return token in CHANGE_KEYWORDS or token == 'NOSIG' or FROM_GROUP.match(token) or PROB_GROUP.match(token)
+
+
+def _decode_change_groups(tokens, index, groups, stop_at):
+    """Decodes TAF change groups or METAR trend groups into `groups`."""
+    count = len(tokens)
+    while index < count:
+        token = tokens[index]
+        if token in stop_at:
+            break
+
+        if token == 'NOSIG':
+            groups.append(ChangeGroup(kind='NOSIG'))
+            index += 1
+            continue
+
+        group = ChangeGroup()
+        match = FROM_GROUP.match(token)
+        if match:
+            group.kind = 'FM'
+            group.start = match.group('time')
+            index += 1
+        else:
+            match = PROB_GROUP.match(token)
+            if match:
+                group.probability = int(match.group('prob'))
+                index += 1
+                if index < count and tokens[index] in ('TEMPO', 'INTER'):
+                    group.kind = f"PROB{match.group('prob')} {tokens[index]}"
+                    index += 1
+                else:
+                    group.kind = f"PROB{match.group('prob')}"
+            elif token in CHANGE_KEYWORDS:
+                group.kind = token
+                index += 1
+            else:
+                # Skip anything we don't recognise rather than failing the whole report
+                index += 1
+                continue
+
+        # Validity period for TAF groups, or FM/TL/AT times for METAR trends
+        while index < count:
+            match = PERIOD.match(tokens[index])
+            if match:
+                group.start, group.end = match.group('start'), match.group('end')
+                index += 1
+                continue
+            match = TREND_TIME.match(tokens[index])
+            if match:
+                if match.group('kind') == 'TL':
+                    group.end = match.group('time')
+                else:
+                    group.start = match.group('time')
+                index += 1
+                continue
+            break
+
+        index = _decode_conditions(tokens, index, group, lambda t: _is_change_start(t) or t in stop_at)
+        groups.append(group)
+
+    return index
+
+
+def decode_metar(text):
+    """
+    Decodes a METAR or SPECI report in a single pass over its tokens.
+
+    :param text: The raw report, with or without the leading METAR/SPECI keyword.
+    :return: A Metar instance.
+    """
+    tokens = _tokenise(text)
+    metar = Metar(raw=text.strip())
+    count = len(tokens)
+    index = 0
+
+    # Header: [METAR|SPECI] [COR] STATION DDHHMMZ [AUTO|COR|NIL]
+    if index < count and tokens[index] in ('METAR', 'SPECI'):
+        metar.kind = tokens[index]
+        index += 1
+    while index < count:
+        token = tokens[index]
+        if token in ('COR', 'AMD', 'NIL'):
+            index += 1
+        elif token == 'AUTO':
+            metar.auto = True
+            index += 1
+        elif metar.station is None and STATION.match(token):
+            metar.station = token
+            index += 1
+        elif metar.time is None and ISSUE_TIME.match(token):
+            metar.time = token[:-1]
+            index += 1
+        else:
+            break
+
+    index = _decode_conditions(tokens, index, metar, lambda t: t == 'RMK' or _is_change_start(t))
+
+    # Temperature, dewpoint, pressure and supplementary groups
+    while index < count:
+        token = tokens[index]
+        if token == 'RMK' or _is_change_start(token):
+            break
+
+        match = TEMPERATURE.match(token)
+        if match and metar.temperature is None:
+            metar.temperature = _parse_temperature(match.group('temp'))
+            metar.dewpoint = _parse_temperature(match.group('dew'))
+        else:
+            match = QNH.match(token)
+            if match:
+                metar.qnh = int(match.group('qnh'))
+            else:
+                match = ALTIMETER.match(token)
+                if match:
+                    metar.altimeter = int(match.group('alt')) / 100
+        index += 1
+
+    index = _decode_change_groups(tokens, index, metar.trends, stop_at=('RMK',))
+
+    if index < count and tokens[index] == 'RMK':
+        metar.remarks = " ".join(tokens[index + 1:])
+
+    return metar
+
+
+def decode_taf(text):
+    """
+    Decodes a TAF into its base forecast and change groups in a single pass.
+
+    :param text: The raw forecast, with or without the leading TAF keyword.
+    :return: A Taf instance.
+    """
+    tokens = _tokenise(text)
+    taf = Taf(raw=text.strip())
+    count = len(tokens)
+    index = 0
+
+    # Header: TAF [AMD|COR] STATION DDHHMMZ DDHH/DDHH
+    while index < count:
+        token = tokens[index]
+        if token in ('TAF', 'COR'):
+            index += 1
+        elif token == 'AMD':
+            taf.amended = True
+            index += 1
+        elif taf.station is None and STATION.match(token):
+            taf.station = token
+            index += 1
+        elif taf.time is None and ISSUE_TIME.match(token):
+            taf.time = token[:-1]
+            index += 1
+        elif taf.valid_from is None and PERIOD.match(token):
+            taf.valid_from, taf.valid_to = token.split('/')
+            index += 1
+        else:
+            break
+
+    taf.base = ChangeGroup(kind='BASE', start=taf.valid_from, end=taf.valid_to)
+    index = _decode_conditions(tokens, index, taf.base, lambda t: t == 'RMK' or _is_change_start(t))
+
+    # Skip anything between the base forecast and the first change group
+    while index < count and tokens[index] != 'RMK' and not _is_change_start(tokens[index]):
+        index += 1
+
+    index = _decode_change_groups(tokens, index, taf.changes, stop_at=('RMK',))
+
+    if index < count and tokens[index] == 'RMK':
+        taf.remarks = " ".join(tokens[index + 1:])
+
+    return taf
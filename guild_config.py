@@ -0,0 +1,145 @@
+import os
+import json
+import logging
+import time
+from dataclasses import dataclass, field, fields, asdict
+
+
+@dataclass
+class GuildConfig:
+    """Settings for a single guild. Anything not set for a guild uses the process defaults."""
+    restricted_roles: list = field(default_factory=lambda: ['@everyone'])
+    welcome_channel_id: int = None
+    rules_channel_id: int = None
+    rules_message_id: int = None
+    welcome_message_file: str = "welcome_message.md"
+    # Role added without affecting the rest of the hierarchy
+    independent_role: str = 'ATC'
+    # Role that, when held, causes the next lower role to be replaced on promotion
+    protected_role: str = 'RPC'
+    # Role given to members selecting their first role
+    member_role: str = 'Member'
+    disabled_commands: list = field(default_factory=list)
+    # Channel where suspected raids are reported
+    mod_alert_channel_id: int = None
+
+    def is_command_enabled(self, name):
+        return name not in self.disabled_commands
+
+
+# Settings that can be changed with !config, and how to read them from text. Paths
+# (welcome_message_file) are left out on purpose: they can only be set by the
+# operator in the config file, so guild admins can't have the bot post host files.
+CONFIG_PARSERS = {
+    'restricted_roles': lambda value: ['@everyone'] + [role.strip() for role in value.split(',') if role.strip() and role.strip() != '@everyone'],
+    'welcome_channel_id': int,
+    'rules_channel_id': int,
+    'rules_message_id': int,
+    'independent_role': str,
+    'protected_role': str,
+    'member_role': str,
+    'mod_alert_channel_id': int,
+}
+
+
+class GuildConfigStore:
+    """
+    Per-guild configuration kept in a JSON file, loaded lazily and cached in memory.
+
+    The file is re-read when its modification time changes (checked at most every
+    `check_interval` seconds), and `update` writes changes back. Either way the
+    cached configs are invalidated and `on_change(guild_id)` listeners are called
+    so dependent caches (role indexes, welcome channels...) can be dropped.
+    """
+
+    def __init__(self, path, defaults, check_interval=5):
+        self.path = path
+        self.defaults = defaults
+        self.check_interval = check_interval
+        self.listeners = []
+        self._overrides = None  # guild id (str) -> dict of settings
+        self._configs = {}  # guild id -> GuildConfig
+        self._mtime = None
+        self._checked_at = 0
+
+    def on_change(self, listener):
+        self.listeners.append(listener)
+        return listener
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, guild_ids):
+        for guild_id in guild_ids:
+            for listener in self.listeners:
+                listener(guild_id)
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if self._overrides is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+
+        if self._overrides is not None and mtime == self._mtime:
+            return
+
+        previous = self._overrides or {}
+        if mtime is None:
+            overrides = {}
+        else:
+            try:
+                with open(self.path, "r") as file:
+                    overrides = json.load(file)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not read guild config {self.path}: {e}")
+                overrides = previous
+
+        self._overrides = overrides
+        self._mtime = mtime
+
+        # Drop cached configs for guilds whose settings changed
+        changed = {key for key in set(previous) | set(overrides) if previous.get(key) != overrides.get(key)}
+        if changed:
+            for key in changed:
+                self._configs.pop(int(key), None)
+            self._notify(int(key) for key in changed)
+
+    def get(self, guild_id):
+        self._reload_if_changed()
+        config = self._configs.get(guild_id)
+        if config is None:
+            settings = dict(self.defaults)
+            settings.update(self._overrides.get(str(guild_id), {}))
+            known = {f.name for f in fields(GuildConfig)}
+            config = GuildConfig(**{key: value for key, value in settings.items() if key in known})
+            self._configs[guild_id] = config
+        return config
+
+    def update(self, guild_id, **changes):
+        self._reload_if_changed()
+        settings = dict(self._overrides.get(str(guild_id), {}))
+        settings.update(changes)
+        self._overrides[str(guild_id)] = settings
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self._overrides, file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime
+
+        self._configs.pop(guild_id, None)
+        self._notify([guild_id])
+        return self.get(guild_id)
+
+    @staticmethod
+    def describe(config):
+        return "\n".join(f"{key}: {value}" for key, value in asdict(config).items())
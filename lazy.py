@@ -0,0 +1,20 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Returns a module that is only actually imported when one of its attributes is
+    first used, so modules that are costly to load don't slow down startup.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,178 @@
+import asyncio
+import bisect
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# The command being handled by the current task, used to label phase timings.
+# Tasks started while handling a command (e.g. gathered fetches) inherit it.
+current_command = contextvars.ContextVar('current_command', default='background')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """Base class for metrics; each keeps its samples in a dict keyed by label values."""
+
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self.header()
+        for values, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """A histogram with fixed upper bounds; each observation is a bisect and three additions."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        sample = self._values.get(labels)
+        if sample is None:
+            # Per-bucket counts (the last is +Inf), then the sum
+            sample = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        sample[bisect.bisect_left(self.buckets, value)] += 1
+        sample[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = self.header()
+        for values, sample in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), sample):
+                cumulative += count
+                labels = _format_labels(self.labels + ('le',), values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {sample[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Collected(Metric):
+    """
+    A metric read from elsewhere only when scraped, so counters other modules
+    already keep (cache hits, gateway events...) cost nothing extra.
+
+    :param collect: A function returning a dict of label value tuples to values.
+    """
+
+    def __init__(self, name, description, labels, collect, kind='gauge'):
+        super().__init__(name, description, labels)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self):
+        self._values = self.collect()
+        return super().render()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+COMMANDS = registry.register(Counter(
+    'bot_commands_total', "Commands handled, by command and outcome.", ('command', 'outcome')))
+COMMAND_LATENCY = registry.register(Histogram(
+    'bot_command_seconds', "Time to handle a command end to end.", ('command',)))
+PHASE_LATENCY = registry.register(Histogram(
+    'bot_phase_seconds', "Time spent in each phase of a command (fetch, parse, send).", ('command', 'phase')))
+UPSTREAM_REQUESTS = registry.register(Counter(
+    'bot_upstream_requests_total', "Upstream request attempts, by upstream and outcome.", ('upstream', 'outcome')))
+EVENT_LOOP_LAG = registry.register(Gauge(
+    'bot_event_loop_lag_seconds', "How late the last event loop lag probe woke up."))
+EVENT_LOOP_LAG_HISTOGRAM = registry.register(Histogram(
+    'bot_event_loop_lag_probe_seconds', "Distribution of event loop lag probes."))
+
+
+def phase(name):
+    """Times a phase of the command handled by the current task."""
+    return PHASE_LATENCY.time(current_command.get(), name)
+
+
+async def monitor_event_loop_lag(interval=1.0):
+    """Measures how late a fixed sleep wakes up; anything past `interval` is time the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+async def start_server(port, host='0.0.0.0'):
+    """
+    Serves the registry in the Prometheus text format at /metrics.
+
+    :return: The aiohttp runner, to be cleaned up on shutdown.
+    """
+    async def handle_metrics(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Serving metrics on port {port}")
+    return runner
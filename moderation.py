@@ -0,0 +1,164 @@
+import asyncio
+import bisect
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+# A user ID, or a mention such as <@123> / <@!123>
+USER_ID = re.compile(r'^(?:<@!?)?(\d{15,21})>?$')
+
+# Discord's bulk ban endpoint accepts at most this many users per request
+BULK_BAN_LIMIT = 200
+
+
+class MemberIndex:
+    """
+    A per-guild index of cached members by lowercased username and join time,
+    kept current from member join/remove events so bans don't scan the member
+    cache.
+    """
+
+    def __init__(self, members):
+        self.by_name = {}
+        self.joined = []  # (joined_at, member id), sorted by join time
+        self.by_id = {}
+        for member in sorted(members, key=lambda m: m.joined_at or datetime.min.replace(tzinfo=timezone.utc)):
+            self.add(member)
+
+    def add(self, member):
+        self.by_id[member.id] = member
+        self.by_name.setdefault(member.name.lower(), set()).add(member.id)
+        if member.joined_at is not None:
+            entry = (member.joined_at, member.id)
+            if not self.joined or self.joined[-1] <= entry:
+                self.joined.append(entry)
+            else:
+                bisect.insort(self.joined, entry)
+
+    def _unname(self, name, member_id):
+        ids = self.by_name.get(name.lower())
+        if ids is not None:
+            ids.discard(member_id)
+            if not ids:
+                del self.by_name[name.lower()]
+
+    def remove(self, member):
+        indexed = self.by_id.pop(member.id, None)
+        self._unname(member.name, member.id)
+        joined_at = (indexed or member).joined_at
+        if joined_at is not None:
+            position = bisect.bisect_left(self.joined, (joined_at, member.id))
+            if position < len(self.joined) and self.joined[position] == (joined_at, member.id):
+                del self.joined[position]
+
+    def rename(self, old_name, member):
+        """Re-files a member under their new username."""
+        if member.id not in self.by_id:
+            return
+        self._unname(old_name, member.id)
+        self.by_name.setdefault(member.name.lower(), set()).add(member.id)
+
+    def find(self, name):
+        return [self.by_id[member_id] for member_id in self.by_name.get(name.lower(), ()) if member_id in self.by_id]
+
+    def joined_since(self, since):
+        start = bisect.bisect_left(self.joined, (since, 0))
+        return [self.by_id[member_id] for _, member_id in self.joined[start:] if member_id in self.by_id]
+
+
+class MemberIndexes:
+    """Lazily built MemberIndex instances, one per guild."""
+
+    def __init__(self):
+        self._indexes = {}
+
+    def get(self, guild):
+        index = self._indexes.get(guild.id)
+        if index is None:
+            index = self._indexes[guild.id] = MemberIndex(guild.members)
+        return index
+
+    def peek(self, guild):
+        return self._indexes.get(guild.id)
+
+    def discard(self, guild_id):
+        self._indexes.pop(guild_id, None)
+
+    def values(self):
+        return self._indexes.values()
+
+
+def parse_ban_targets(args):
+    """
+    Splits !ban arguments into user IDs and usernames.
+
+    :return: A tuple of (list of IDs, list of usernames).
+    """
+    ids = []
+    names = []
+    for arg in args:
+        for token in arg.split(','):
+            token = token.strip()
+            if not token:
+                continue
+            match = USER_ID.match(token)
+            if match:
+                ids.append(int(match.group(1)))
+            else:
+                names.append(token)
+    return ids, names
+
+
+def joined_within(index, minutes):
+    return index.joined_since(datetime.now(timezone.utc) - timedelta(minutes=minutes))
+
+
+async def ban_many(guild, user_ids, reason=None, concurrency=3):
+    """
+    Bans many users, using the bulk ban endpoint when this version of discord.py
+    supports it, otherwise individual bans with bounded concurrency. discord.py
+    waits out rate limits per bucket, so the concurrency limit only stops a large
+    ban list from queueing hundreds of requests at once.
+
+    Bulk bans also need the Manage Server permission, so a single target is banned
+    directly, and a bot without that permission falls back to individual bans.
+
+    :return: A tuple of (banned IDs, failed IDs).
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    banned = []
+    failed = []
+
+    remaining = user_ids
+    if hasattr(guild, 'bulk_ban') and len(user_ids) > 1:
+        remaining = []
+        for start in range(0, len(user_ids), BULK_BAN_LIMIT):
+            chunk = [discord.Object(id=user_id) for user_id in user_ids[start:start + BULK_BAN_LIMIT]]
+            try:
+                result = await guild.bulk_ban(chunk, reason=reason)
+            except discord.Forbidden as e:
+                logging.info(f"Bulk ban not permitted ({e}); banning individually")
+                remaining = user_ids[start:]
+                break
+            except discord.HTTPException as e:
+                logging.warning(f"Bulk ban of {len(chunk)} users failed: {e}")
+                failed.extend(user.id for user in chunk)
+                continue
+            banned.extend(user.id for user in result.banned)
+            failed.extend(user.id for user in result.failed)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ban_one(user_id):
+        async with semaphore:
+            try:
+                await guild.ban(discord.Object(id=user_id), reason=reason)
+                banned.append(user_id)
+            except discord.HTTPException as e:
+                logging.warning(f"Failed to ban {user_id}: {e}")
+                failed.append(user_id)
+
+    await asyncio.gather(*(ban_one(user_id) for user_id in remaining))
+    return banned, failed
@@ -0,0 +1,150 @@
+import re
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+# Trailing/embedded digits and separators are stripped to compare names, so
+# "spam_bot123" and "SpamBot77" share the skeleton "spambot"
+NAME_NOISE = re.compile(r'[\d_\-.\s]+')
+
+
+def name_skeleton(name):
+    return NAME_NOISE.sub('', name.lower())
+
+
+class RaidDetector:
+    """
+    Streaming join-rate detector for a single guild.
+
+    Each join is recorded in a fixed-size ring buffer along with whether the
+    account is new and the skeleton of its name. A running Counter of skeletons is
+    updated as joins enter and leave the window, so every join is handled in O(1)
+    amortised time and memory never grows beyond `max_tracked` joins.
+
+    A raid starts when more than `join_threshold` members join within `window`
+    seconds, or when `similar_threshold` members with the same name skeleton do.
+    While a raid is active, joins from new accounts or with a repeated name
+    skeleton are added to the suspects; the raid ends after `cooldown` seconds
+    without a burst.
+    """
+
+    def __init__(self, window=60, join_threshold=10, similar_threshold=4,
+                 min_account_age=7 * 24 * 3600, cooldown=300, max_tracked=2000):
+        self.window = window
+        self.join_threshold = join_threshold
+        self.similar_threshold = similar_threshold
+        self.min_account_age = min_account_age
+        self.cooldown = cooldown
+        self.recent = deque(maxlen=max_tracked)  # (time, member id, new account, skeleton)
+        self.skeletons = Counter()
+        self.suspects = deque(maxlen=max_tracked)
+        self._suspect_ids = set()
+        self.active = False
+        self.started_at = None
+        self.last_burst_at = None
+        self.joins_during_raid = 0
+
+    def _expire(self, now):
+        while self.recent and self.recent[0][0] <= now - self.window:
+            _, _, _, skeleton = self.recent.popleft()
+            self._forget_skeleton(skeleton)
+
+    def _forget_skeleton(self, skeleton):
+        self.skeletons[skeleton] -= 1
+        if self.skeletons[skeleton] <= 0:
+            del self.skeletons[skeleton]
+
+    def _add_suspect(self, member_id):
+        if member_id in self._suspect_ids:
+            return
+        if len(self.suspects) == self.suspects.maxlen:
+            self._suspect_ids.discard(self.suspects[0])
+        self.suspects.append(member_id)
+        self._suspect_ids.add(member_id)
+
+    def observe(self, member_id, name, created_at, now=None):
+        """
+        Records a join.
+
+        :param member_id: The joining member's ID.
+        :param name: The member's username.
+        :param created_at: When the account was created (timezone-aware datetime).
+        :return: True if this join started a raid.
+        """
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        account_age = (datetime.now(timezone.utc) - created_at).total_seconds() if created_at else None
+        new_account = account_age is not None and account_age < self.min_account_age
+        skeleton = name_skeleton(name) or name.lower()
+
+        # The oldest entry is about to be pushed out of a full ring buffer
+        if len(self.recent) == self.recent.maxlen:
+            self._forget_skeleton(self.recent[0][3])
+        self.recent.append((now, member_id, new_account, skeleton))
+        self.skeletons[skeleton] += 1
+
+        similar = self.skeletons[skeleton]
+        burst = len(self.recent) > self.join_threshold or similar >= self.similar_threshold
+
+        started = False
+        if burst:
+            self.last_burst_at = now
+            if not self.active:
+                self.active = True
+                self.started_at = now
+                self.joins_during_raid = 0
+                started = True
+                # Joins already in the window are part of the raid too
+                for _, recent_id, recent_new, recent_skeleton in self.recent:
+                    if recent_new or self.skeletons[recent_skeleton] > 1:
+                        self._add_suspect(recent_id)
+        elif self.active and now - self.last_burst_at >= self.cooldown:
+            self.active = False
+
+        if self.active:
+            self.joins_during_raid += 1
+            if new_account or similar > 1:
+                self._add_suspect(member_id)
+
+        return started
+
+    @property
+    def join_rate(self):
+        """Joins per minute over the current window."""
+        return len(self.recent) * 60 / self.window
+
+    def check_cooldown(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.active and now - self.last_burst_at >= self.cooldown:
+            self.active = False
+        return self.active
+
+    def clear(self):
+        self.active = False
+        self.suspects.clear()
+        self._suspect_ids.clear()
+        self.joins_during_raid = 0
+
+    def is_suspect(self, member_id):
+        return member_id in self._suspect_ids
+
+
+class RaidDetectors:
+    """Lazily created RaidDetector instances, one per guild, sharing the same settings."""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._detectors = {}
+
+    def get(self, guild_id):
+        detector = self._detectors.get(guild_id)
+        if detector is None:
+            detector = self._detectors[guild_id] = RaidDetector(**self.settings)
+        return detector
+
+    def peek(self, guild_id):
+        return self._detectors.get(guild_id)
+
+    def discard(self, guild_id):
+        self._detectors.pop(guild_id, None)
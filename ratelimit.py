@@ -0,0 +1,95 @@
+import re
+import time
+from collections import OrderedDict
+
+from discord.ext import commands
+
+WHITESPACE = re.compile(r'\s+')
+
+
+class DuplicateCommand(commands.CheckFailure):
+    """Raised when the same command was just run in the same channel."""
+
+    def __init__(self, earlier):
+        super().__init__("Duplicate command")
+        self.earlier = earlier
+
+
+class CommandRateLimiter:
+    """
+    Token buckets for commands, kept separately per user, per channel and per
+    command across the whole bot, each scoped to the command being run. A command
+    runs only if all three buckets have a token left.
+
+    Buckets are discord.py cooldown mappings, which drop idle buckets on their own,
+    so memory only grows with the number of recently active users and channels.
+    """
+
+    def __init__(self, user_rate, channel_rate, command_rate):
+        self.scopes = [
+            (commands.BucketType.user, commands.CooldownMapping(
+                commands.Cooldown(*user_rate), lambda ctx: (ctx.author.id, ctx.command.qualified_name))),
+            (commands.BucketType.channel, commands.CooldownMapping(
+                commands.Cooldown(*channel_rate), lambda ctx: (ctx.channel.id, ctx.command.qualified_name))),
+            (commands.BucketType.default, commands.CooldownMapping(
+                commands.Cooldown(*command_rate), lambda ctx: ctx.command.qualified_name)),
+        ]
+
+    def check(self, ctx):
+        """Takes a token from each bucket, raising CommandOnCooldown if any is empty."""
+        now = time.time()
+        buckets = [(bucket_type, mapping.get_bucket(ctx, now)) for bucket_type, mapping in self.scopes]
+        for bucket_type, bucket in buckets:
+            retry_after = bucket.get_retry_after(now)
+            if retry_after:
+                raise commands.CommandOnCooldown(bucket, retry_after, bucket_type)
+        # Only spend tokens once every bucket has allowed the command
+        for _, bucket in buckets:
+            bucket.update_rate_limit(now)
+
+
+class CommandDeduplicator:
+    """
+    Remembers recent commands per channel so an identical command repeated within
+    `window` seconds can point at the earlier answer instead of being run again.
+
+    At most `max_entries` commands are remembered; the oldest are forgotten first.
+    """
+
+    def __init__(self, window=15, max_entries=1024):
+        self.window = window
+        self.max_entries = max_entries
+        self._recent = OrderedDict()  # (channel id, command text) -> [time, command message, first reply]
+
+    @staticmethod
+    def key(ctx):
+        return ctx.channel.id, WHITESPACE.sub(' ', ctx.message.content.strip()).casefold()
+
+    def claim(self, ctx, now=None):
+        """
+        Registers a command, returning None if it should run, or the earlier
+        [time, command message, reply] entry if it is a repeat.
+        """
+        now = time.monotonic() if now is None else now
+        key = self.key(ctx)
+        earlier = self._recent.get(key)
+        if earlier is not None and now - earlier[0] < self.window:
+            return earlier
+
+        self._recent[key] = [now, ctx.message, None]
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+        return None
+
+    def record_reply(self, ctx, reply):
+        entry = self._recent.get(self.key(ctx))
+        if entry is not None and entry[1].id == ctx.message.id and entry[2] is None:
+            entry[2] = reply
+
+    def forget(self, ctx):
+        """Drops a command that failed, so repeating it runs it again."""
+        key = self.key(ctx)
+        entry = self._recent.get(key)
+        if entry is not None and entry[1].id == ctx.message.id:
+            del self._recent[key]
@@ -0,0 +1,176 @@
+class RoleIndex:
+    """
+    A per-guild index of roles, kept up to date from role create/update/delete
+    events so commands don't rescan `guild.roles` on every call.
+
+    Provides case-insensitive lookup by name, restricted-role checks, the list of
+    selectable roles in position order, and the pre-rendered `!roles` listing.
+    """
+
+    def __init__(self, roles, restricted_names):
+        self.restricted_names = frozenset(restricted_names)
+        self.by_id = {role.id: role for role in roles}
+        self.by_name = {}
+        self._selectable = None
+        self._listing = None
+        for role in sorted(roles, key=lambda r: r.position):
+            # When names clash the highest role wins, matching the old lookup dict
+            self.by_name[role.name.lower()] = role
+
+    def _invalidate(self):
+        self._selectable = None
+        self._listing = None
+
+    def _reindex_name(self, name):
+        """Recomputes the lookup entry for a name after the role it pointed to changed."""
+        key = name.lower()
+        matches = [role for role in self.by_id.values() if role.name.lower() == key]
+        if matches:
+            self.by_name[key] = max(matches, key=lambda r: r.position)
+        else:
+            self.by_name.pop(key, None)
+
+    def add(self, role):
+        self.by_id[role.id] = role
+        current = self.by_name.get(role.name.lower())
+        if current is None or current.position <= role.position:
+            self.by_name[role.name.lower()] = role
+        self._invalidate()
+
+    def remove(self, role):
+        self.by_id.pop(role.id, None)
+        current = self.by_name.get(role.name.lower())
+        if current is not None and current.id == role.id:
+            self._reindex_name(role.name)
+        self._invalidate()
+
+    def update(self, before, after):
+        self.by_id[after.id] = after
+        key = after.name.lower()
+        current = self.by_name.get(key)
+        if before.name.lower() == key and current is not None and current.id == after.id:
+            # Common case (e.g. a position or colour change): no name clash to resolve
+            self.by_name[key] = after
+        else:
+            if before.name.lower() != key:
+                self._reindex_name(before.name)
+            self._reindex_name(after.name)
+        self._invalidate()
+
+    def get(self, name):
+        return self.by_name.get(name.lower())
+
+    def is_restricted(self, role):
+        return role.name in self.restricted_names
+
+    @property
+    def selectable(self):
+        """Roles members may select, in position order (lowest first)."""
+        if self._selectable is None:
+            self._selectable = sorted(
+                (role for role in self.by_id.values() if not self.is_restricted(role)),
+                key=lambda r: r.position
+            )
+        return self._selectable
+
+    @property
+    def listing(self):
+        """The bullet list of selectable roles shown by `!roles`."""
+        if self._listing is None:
+            self._listing = "\n".join(f"• {role.name}" for role in self.selectable)
+        return self._listing
+
+
+class RoleIndexes:
+    """
+    Lazily built RoleIndex instances, one per guild.
+
+    :param restricted_names_for: A function returning the restricted role names for a guild id.
+    """
+
+    def __init__(self, restricted_names_for):
+        self.restricted_names_for = restricted_names_for
+        self._indexes = {}
+
+    def get(self, guild):
+        index = self._indexes.get(guild.id)
+        if index is None:
+            index = RoleIndex(guild.roles, self.restricted_names_for(guild.id))
+            self._indexes[guild.id] = index
+        return index
+
+    def peek(self, guild):
+        """Returns the guild's index only if it has already been built."""
+        return self._indexes.get(guild.id)
+
+    def discard(self, guild_id):
+        self._indexes.pop(guild_id, None)
+
+
+def plan_role_additions(member_roles, role_names, index, config):
+    """
+    Works out the complete set of roles a member should end up with after adding
+    each of `role_names`, applying the guild's independent, protected and member
+    role rules as if the roles were added one at a time.
+
+    :param member_roles: The member's current roles.
+    :param role_names: The role names requested, in order.
+    :param index: The guild's RoleIndex.
+    :param config: The guild's GuildConfig.
+    :return: A tuple of (desired roles in position order, list of reply lines).
+    """
+    roles = sorted(member_roles, key=lambda r: r.position)
+    lines = []
+
+    for role_name in role_names:
+        requested_role = index.get(role_name)
+
+        if requested_role is None:
+            lines.append(f"Sorry, the role '{role_name}' does not exist.")
+            continue
+
+        if index.is_restricted(requested_role):
+            lines.append(f"The role '{role_name}' cannot be added.")
+            continue
+
+        if any(role.id == requested_role.id for role in roles):
+            lines.append(f"You already have the role '{role_name}'.")
+            continue
+
+        # Special case for the independent role (e.g. 'ATC')
+        if requested_role.name == config.independent_role:
+            roles.append(requested_role)
+            roles.sort(key=lambda r: r.position)
+            lines.append(f"Added role '{requested_role.name}'.")
+            continue
+
+        # Check for higher roles and remove lower roles
+        higher_role = None
+        role_names_held = set()
+        for role in roles:
+            role_names_held.add(role.name)
+            if role.position < requested_role.position and not index.is_restricted(role):
+                higher_role = role
+
+        if higher_role:
+            protected = config.protected_role
+            if protected in role_names_held and requested_role.name != protected:
+                if higher_role.name != protected:
+                    roles.remove(higher_role)
+                    lines.append(f"Removed lower role '{higher_role.name}'.")
+
+        # Assign the member role if user has no other roles
+        if len(roles) <= 1:  # @everyone is always present
+            member_role = index.get(config.member_role)
+            # Unless the member role is the one being requested (or already held)
+            if (member_role is not None and member_role.id != requested_role.id
+                    and not any(role.id == member_role.id for role in roles)):
+                roles.append(member_role)
+                lines.append(f"Assigned '{member_role.name}' role.")
+
+        # Add the requested role
+        roles.append(requested_role)
+        roles.sort(key=lambda r: r.position)
+        lines.append(f"Added role '{requested_role.name}'.")
+
+    return roles, lines
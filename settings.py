@@ -0,0 +1,201 @@
+"""
+Process-wide settings, read from environment variables once at startup.
+
+Parsing never raises: problems are collected in `errors` (or `warnings` for
+settings that only disable a feature) so `check()` can report every bad value
+at once, before the bot loads anything heavy or connects to Discord.
+"""
+import os
+import logging
+
+errors = []
+warnings = []
+
+
+def env_str(name, default=None):
+    value = os.getenv(name)
+    return value if value not in (None, '') else default
+
+
+def env_int(name, default=None, minimum=None):
+    value = env_str(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        errors.append(f"{name} must be a whole number, got '{value}'")
+        return default
+    if minimum is not None and number < minimum:
+        errors.append(f"{name} must be at least {minimum}, got {number}")
+        return default
+    return number
+
+
+def env_float(name, default, minimum=None):
+    value = env_str(name)
+    if value is None:
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        errors.append(f"{name} must be a number, got '{value}'")
+        return default
+    if minimum is not None and number < minimum:
+        errors.append(f"{name} must be at least {minimum:g}, got {number:g}")
+        return default
+    return number
+
+
+def env_list(name, default=''):
+    return [item.strip() for item in (env_str(name) or default).split(',') if item.strip()]
+
+
+def env_rate(name, default):
+    """Parses a rate such as '3/30' (3 commands per 30 seconds) into (rate, per)."""
+    value = env_str(name, default)
+    try:
+        rate, per = value.split('/')
+        return int(rate), float(per)
+    except ValueError:
+        errors.append(f"{name} must look like <commands>/<seconds>, got '{value}'")
+        rate, per = default.split('/')
+        return int(rate), float(per)
+
+
+# Discord
+DISCORD_TOKEN = env_str('DISCORD_TOKEN')
+
+# Runtime mode: 'production' shards automatically and only subscribes to what the
+# commands need; 'legacy' keeps the original single-shard, all-intents setup
+BOT_RUNTIME_MODE = env_str('BOT_RUNTIME_MODE', 'production').lower()
+if BOT_RUNTIME_MODE not in ('production', 'legacy'):
+    errors.append(f"BOT_RUNTIME_MODE must be 'production' or 'legacy', got '{BOT_RUNTIME_MODE}'")
+
+# Command extensions loaded at startup; each can be reloaded with !reload
+EXTENSIONS = env_list('EXTENSIONS', 'weather,roles,welcome,moderation,admin')
+
+# Warn when connecting takes longer than this many seconds
+STARTUP_TARGET_SECONDS = env_float('STARTUP_TARGET_SECONDS', 10)
+
+# Static restricted role, plus any listed in RESTRICTED_ROLES
+STATIC_RESTRICTED_ROLE = '@everyone'
+RESTRICTED_ROLES = [STATIC_RESTRICTED_ROLE] + env_list('RESTRICTED_ROLES')
+
+# Per-guild settings; these environment variables provide the defaults for every guild
+GUILD_CONFIG_PATH = env_str('GUILD_CONFIG_PATH', 'data/guild_config.json')
+WELCOME_CHANNEL_ID = env_int('WELCOME_CHANNEL_ID')
+RULES_CHANNEL_ID = env_int('RULES_CHANNEL_ID')
+RULES_MESSAGE_ID = env_int('RULES_MESSAGE_ID')
+MOD_ALERT_CHANNEL_ID = env_int('MOD_ALERT_CHANNEL_ID')
+
+# Join bursts: more than WELCOME_BURST_THRESHOLD joins within WELCOME_BURST_WINDOW
+# seconds are welcomed together, once per window
+WELCOME_BURST_WINDOW = env_int('WELCOME_BURST_WINDOW', 10, minimum=1)
+WELCOME_BURST_THRESHOLD = env_int('WELCOME_BURST_THRESHOLD', 5, minimum=1)
+WELCOME_BATCH_MAX_MENTIONS = 50
+
+# Most users a single !ban may target
+MAX_BAN_TARGETS = env_int('MAX_BAN_TARGETS', 1000, minimum=1)
+
+# Raid detection: more than RAID_JOIN_THRESHOLD joins, or RAID_SIMILAR_THRESHOLD joins
+# with near-identical names, within RAID_WINDOW seconds. Accounts younger than
+# RAID_MIN_ACCOUNT_AGE_DAYS joining during a raid are flagged as suspects.
+RAID_WINDOW = env_int('RAID_WINDOW', 60, minimum=1)
+RAID_JOIN_THRESHOLD = env_int('RAID_JOIN_THRESHOLD', 15, minimum=1)
+RAID_SIMILAR_THRESHOLD = env_int('RAID_SIMILAR_THRESHOLD', 5, minimum=2)
+RAID_MIN_ACCOUNT_AGE_DAYS = env_int('RAID_MIN_ACCOUNT_AGE_DAYS', 7, minimum=0)
+RAID_COOLDOWN = env_int('RAID_COOLDOWN', 300, minimum=0)
+# Most joins (and suspects) remembered per guild; must exceed the join threshold,
+# or rate-based detection could never trigger
+RAID_MAX_TRACKED = env_int('RAID_MAX_TRACKED', 10000, minimum=1)
+if RAID_MAX_TRACKED <= max(RAID_JOIN_THRESHOLD, RAID_SIMILAR_THRESHOLD):
+    errors.append(f"RAID_MAX_TRACKED ({RAID_MAX_TRACKED}) must be larger than RAID_JOIN_THRESHOLD and RAID_SIMILAR_THRESHOLD")
+
+# Command rate limits, as '<commands>/<seconds>' per user, per channel and bot-wide,
+# applied to each of RATE_LIMITED_COMMANDS separately
+RATE_LIMITED_COMMANDS = set(env_list('RATE_LIMITED_COMMANDS', 'brief,metar,taf,atis,route,time,welcome,roles'))
+RATE_LIMIT_USER = env_rate('RATE_LIMIT_USER', '3/30')
+RATE_LIMIT_CHANNEL = env_rate('RATE_LIMIT_CHANNEL', '10/60')
+RATE_LIMIT_COMMAND = env_rate('RATE_LIMIT_COMMAND', '60/60')
+RATE_LIMIT_NOTICE_INTERVAL = 30
+
+# Identical commands in a channel within DEDUP_WINDOW seconds reference the first answer
+DEDUP_COMMANDS = set(env_list('DEDUP_COMMANDS', 'brief,metar,taf,atis,route'))
+DEDUP_WINDOW = env_int('DEDUP_WINDOW', 15, minimum=0)
+
+# Most zones a single !time may show
+MAX_TIME_ZONES = 10
+
+# AirServices Australia NAIPS credentials and SOAP service
+AIRSERVICES_USERNAME = env_str('AIRSERVICES_USERNAME')
+AIRSERVICES_PASSWORD = env_str('AIRSERVICES_PASSWORD')
+if AIRSERVICES_USERNAME is None or AIRSERVICES_PASSWORD is None:
+    warnings.append("AIRSERVICES_USERNAME/AIRSERVICES_PASSWORD are not set; Australian weather will be unavailable")
+AIRSERVICES_URL = env_str('AIRSERVICES_URL', "https://www.airservicesaustralia.com/naips/briefing-service?wsdl")
+# Base URL for the aviationweather.gov data API
+AVIATIONWEATHER_URL = env_str('AVIATIONWEATHER_URL', "https://aviationweather.gov/api/data")
+
+# Default connect/read/total timeouts (seconds) for upstream requests
+HTTP_CONNECT_TIMEOUT = env_float('HTTP_CONNECT_TIMEOUT', 5, minimum=0.1)
+HTTP_READ_TIMEOUT = env_float('HTTP_READ_TIMEOUT', 10, minimum=0.1)
+HTTP_TOTAL_TIMEOUT = env_float('HTTP_TOTAL_TIMEOUT', 15, minimum=0.1)
+
+# Maximum number of in-flight requests per upstream
+HTTP_MAX_CONCURRENCY = env_int('HTTP_MAX_CONCURRENCY', 8, minimum=1)
+
+# Retries for failed requests, with capped exponential backoff (seconds)
+HTTP_MAX_RETRIES = env_int('HTTP_MAX_RETRIES', 2, minimum=0)
+HTTP_RETRY_BACKOFF = env_float('HTTP_RETRY_BACKOFF', 0.5, minimum=0)
+HTTP_RETRY_BACKOFF_MAX = env_float('HTTP_RETRY_BACKOFF_MAX', 4, minimum=0)
+# Each successful request earns this fraction of a retry, so retries can't multiply load during an outage
+HTTP_RETRY_RATIO = env_float('HTTP_RETRY_RATIO', 0.2, minimum=0)
+HTTP_RETRY_BUDGET_MAX = env_float('HTTP_RETRY_BUDGET_MAX', 10, minimum=0)
+
+# Consecutive failures before the circuit opens, and how long it stays open (seconds)
+BREAKER_FAILURE_THRESHOLD = env_int('BREAKER_FAILURE_THRESHOLD', 5, minimum=1)
+BREAKER_RESET_TIMEOUT = env_float('BREAKER_RESET_TIMEOUT', 30, minimum=0)
+
+# Briefing cache settings (seconds / number of stations)
+BRIEFING_CACHE_TTL = env_int('BRIEFING_CACHE_TTL', 300, minimum=0)
+BRIEFING_CACHE_SIZE = env_int('BRIEFING_CACHE_SIZE', 256, minimum=1)
+# METARs are issued every half hour; allow a short grace period for publication
+BRIEFING_ISSUE_CYCLE = 1800
+BRIEFING_ISSUE_GRACE = env_int('BRIEFING_ISSUE_GRACE', 120, minimum=0)
+# How long past expiry weather may still be served when the upstream is down, and
+# how long to wait for a refresh before serving it anyway (seconds)
+STALE_TTL = env_int('STALE_TTL', 3600, minimum=0)
+STALE_TIMEOUT = env_float('STALE_TIMEOUT', 3)
+
+# On-disk copy of the weather caches so a restart doesn't start cold (set to '' to disable)
+WEATHER_CACHE_PATH = os.getenv('WEATHER_CACHE_PATH', 'data/weather_cache.sqlite3')
+
+# Most stations a single metar/taf command may request
+MAX_BATCH_STATIONS = env_int('MAX_BATCH_STATIONS', 10, minimum=1)
+
+# Stations refreshed in the background, and where to announce ATIS/METAR changes
+WATCH_STATIONS = [station.upper() for station in env_list('WATCH_STATIONS')]
+WATCH_INTERVAL = env_int('WATCH_INTERVAL', 300, minimum=30)
+WATCH_CHANNEL_ID = env_int('WATCH_CHANNEL_ID')
+for station in WATCH_STATIONS:
+    if not (station.startswith('Y') and len(station) == 4):
+        warnings.append(f"Ignoring watched station {station}: only Australian stations can be watched")
+
+# Metrics served at http://<host>:METRICS_PORT/metrics; set METRICS_PORT=0 to disable
+METRICS_PORT = env_int('METRICS_PORT', 8000, minimum=0)
+
+
+def check(require_token=True):
+    """
+    Logs warnings and exits with every configuration error at once.
+
+    :param require_token: Whether DISCORD_TOKEN must be set (not needed by benchmarks).
+    """
+    for warning in warnings:
+        logging.warning(warning)
+
+    problems = list(errors)
+    if require_token and DISCORD_TOKEN is None:
+        problems.insert(0, "No Discord token provided. Set the DISCORD_TOKEN environment variable.")
+    if problems:
+        raise SystemExit("Invalid configuration:\n" + "\n".join(f"  - {problem}" for problem in problems))
@@ -0,0 +1,149 @@
+import re
+import difflib
+from datetime import timedelta, timezone
+
+import pytz
+
+# UTC offsets such as +8, -05, +0930 or +09:30
+UTC_OFFSET = re.compile(r'^([+-])(\d{1,2})(?::?(\d{2}))?$')
+
+# Common abbreviations. These are fixed offsets rather than zones, so 'AEST' is
+# always UTC+10 even while Sydney is observing daylight saving.
+ABBREVIATIONS = {
+    'ZULU': 0, 'Z': 0, 'UTC': 0, 'GMT': 0,
+    'AEST': 10, 'AEDT': 11, 'ACST': 9.5, 'ACDT': 10.5, 'AWST': 8,
+    'NZST': 12, 'NZDT': 13,
+    'JST': 9, 'KST': 9, 'HKT': 8, 'SGT': 8, 'IST': 5.5,
+    'CET': 1, 'CEST': 2, 'EET': 2, 'EEST': 3, 'BST': 1, 'WET': 0, 'WEST': 1,
+    'EST': -5, 'EDT': -4, 'CST': -6, 'CDT': -5, 'MST': -7, 'MDT': -6,
+    'PST': -8, 'PDT': -7, 'AKST': -9, 'AKDT': -8, 'HST': -10,
+}
+
+# Aerodromes whose country spans several zones
+AERODROME_ZONES = {
+    'YSSY': 'Australia/Sydney', 'YSCB': 'Australia/Sydney', 'YSBK': 'Australia/Sydney',
+    'YSWG': 'Australia/Sydney', 'YSDU': 'Australia/Sydney', 'YWLM': 'Australia/Sydney',
+    'YMML': 'Australia/Melbourne', 'YMAV': 'Australia/Melbourne', 'YMMB': 'Australia/Melbourne',
+    'YMEN': 'Australia/Melbourne', 'YMHB': 'Australia/Hobart', 'YMLT': 'Australia/Hobart',
+    'YBBN': 'Australia/Brisbane', 'YBCG': 'Australia/Brisbane', 'YBAF': 'Australia/Brisbane',
+    'YBCS': 'Australia/Brisbane', 'YBTL': 'Australia/Brisbane', 'YBSU': 'Australia/Brisbane',
+    'YBRK': 'Australia/Brisbane', 'YBMK': 'Australia/Brisbane', 'YBHM': 'Australia/Brisbane',
+    'YPAD': 'Australia/Adelaide', 'YPPF': 'Australia/Adelaide',
+    'YPPH': 'Australia/Perth', 'YPJT': 'Australia/Perth', 'YPKG': 'Australia/Perth',
+    'YPLM': 'Australia/Perth', 'YBRM': 'Australia/Perth',
+    'YPDN': 'Australia/Darwin', 'YBAS': 'Australia/Darwin', 'YPTN': 'Australia/Darwin',
+    'YSNF': 'Pacific/Norfolk', 'YPXM': 'Indian/Christmas', 'YPCC': 'Indian/Cocos',
+    'KJFK': 'America/New_York', 'KEWR': 'America/New_York', 'KBOS': 'America/New_York',
+    'KATL': 'America/New_York', 'KMIA': 'America/New_York', 'KIAD': 'America/New_York',
+    'KORD': 'America/Chicago', 'KDFW': 'America/Chicago', 'KIAH': 'America/Chicago',
+    'KDEN': 'America/Denver', 'KPHX': 'America/Phoenix', 'KSLC': 'America/Denver',
+    'KLAX': 'America/Los_Angeles', 'KSFO': 'America/Los_Angeles', 'KSEA': 'America/Los_Angeles',
+    'KLAS': 'America/Los_Angeles', 'PHNL': 'Pacific/Honolulu', 'PANC': 'America/Anchorage',
+    'CYYZ': 'America/Toronto', 'CYUL': 'America/Toronto', 'CYVR': 'America/Vancouver',
+    'CYYC': 'America/Edmonton',
+}
+
+# ICAO prefixes that map to a single zone
+AERODROME_PREFIX_ZONES = {
+    'NZ': 'Pacific/Auckland', 'AY': 'Pacific/Port_Moresby', 'NF': 'Pacific/Fiji',
+    'WS': 'Asia/Singapore', 'VH': 'Asia/Hong_Kong', 'RJ': 'Asia/Tokyo', 'RO': 'Asia/Tokyo',
+    'RK': 'Asia/Seoul', 'RC': 'Asia/Taipei', 'RP': 'Asia/Manila', 'VT': 'Asia/Bangkok',
+    'VV': 'Asia/Ho_Chi_Minh', 'VI': 'Asia/Kolkata', 'VA': 'Asia/Kolkata', 'VO': 'Asia/Kolkata',
+    'VE': 'Asia/Kolkata', 'Z': 'Asia/Shanghai', 'OM': 'Asia/Dubai', 'OT': 'Asia/Qatar',
+    'OE': 'Asia/Riyadh', 'LL': 'Asia/Jerusalem', 'LT': 'Europe/Istanbul',
+    'EG': 'Europe/London', 'EI': 'Europe/Dublin', 'LF': 'Europe/Paris', 'ED': 'Europe/Berlin',
+    'ET': 'Europe/Berlin', 'EH': 'Europe/Amsterdam', 'EB': 'Europe/Brussels',
+    'LS': 'Europe/Zurich', 'LO': 'Europe/Vienna', 'LI': 'Europe/Rome', 'EK': 'Europe/Copenhagen',
+    'EN': 'Europe/Oslo', 'ES': 'Europe/Stockholm', 'EF': 'Europe/Helsinki', 'EP': 'Europe/Warsaw',
+    'LK': 'Europe/Prague', 'LH': 'Europe/Budapest', 'LG': 'Europe/Athens', 'LP': 'Europe/Lisbon',
+    'FA': 'Africa/Johannesburg', 'HE': 'Africa/Cairo',
+}
+
+AERODROME = re.compile(r'^[A-Z]{4}$')
+
+
+def normalise(name):
+    return name.strip().lower().replace('_', ' ')
+
+
+class TimezoneIndex:
+    """
+    Resolves what users type for `!time` to a tzinfo: IANA names, city names
+    ('Sydney', 'new york'), abbreviations, UTC offsets and ICAO aerodromes.
+
+    Every name is indexed once when the index is built, and each zone is loaded
+    from pytz only the first time it is used. Names that don't match exactly fall
+    back to the closest indexed name, so small typos still resolve.
+    """
+
+    def __init__(self):
+        self._names = {}  # normalised name -> IANA zone name
+        self._zones = {}  # IANA zone name -> tzinfo
+        self._offsets = {}  # offset in minutes -> tzinfo
+
+        # Cities from all zones first, then common zones, so a common zone wins a clash
+        for names in (pytz.all_timezones, pytz.common_timezones):
+            for zone in names:
+                self._names[normalise(zone.rsplit('/', 1)[-1])] = zone
+        for zone in pytz.all_timezones:
+            self._names[normalise(zone)] = zone
+
+        self._abbreviations = {
+            abbreviation.lower(): timezone(timedelta(hours=hours), 'UTC' if hours == 0 else abbreviation)
+            for abbreviation, hours in ABBREVIATIONS.items()
+        }
+
+    def _fixed_offset(self, minutes):
+        tz = self._offsets.get(minutes)
+        if tz is None:
+            tz = self._offsets[minutes] = timezone(timedelta(minutes=minutes))
+        return tz
+
+    def _zone(self, zone):
+        tz = self._zones.get(zone)
+        if tz is None:
+            tz = self._zones[zone] = pytz.timezone(zone)
+        return tz
+
+    def _offset(self, text):
+        match = UTC_OFFSET.match(text)
+        if match is None:
+            return None
+        sign, hours, minutes = match.groups()
+        total = int(hours) * 60 + int(minutes or 0)
+        if total > 14 * 60 or int(minutes or 0) >= 60:
+            return None
+        return self._fixed_offset(-total if sign == '-' else total)
+
+    def resolve(self, text):
+        """
+        :param text: What the user typed (e.g. 'Zulu', 'AEST', 'Sydney', 'YSSY', '+8').
+        :return: A tuple of (label, tzinfo), or None if nothing matches.
+        """
+        text = text.strip()
+        key = normalise(text)
+
+        tz = self._abbreviations.get(key)
+        if tz is not None:
+            return text.upper(), tz
+
+        if text.startswith(('+', '-')):
+            tz = self._offset(text)
+            return (f"UTC{text}", tz) if tz is not None else None
+
+        zone = self._names.get(key)
+        if zone is not None:
+            return zone, self._zone(zone)
+
+        # Checked after names so cities like 'Rome' aren't read as aerodromes
+        upper = text.upper()
+        if AERODROME.match(upper):
+            zone = AERODROME_ZONES.get(upper) or AERODROME_PREFIX_ZONES.get(upper[:2]) or AERODROME_PREFIX_ZONES.get(upper[:1])
+            if zone is not None:
+                return f"{upper} ({zone})", self._zone(zone)
+
+        close = difflib.get_close_matches(key, self._names.keys(), n=1, cutoff=0.8)
+        if not close:
+            return None
+        zone = self._names[close[0]]
+        return zone, self._zone(zone)
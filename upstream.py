@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+import time
+import aiohttp
+import metrics
+import settings
+
+class UpstreamError(Exception):
+    """Raised when an upstream request fails due to a network issue or timeout."""
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+
+class UpstreamResponse:
+    def __init__(self, status, text):
+        self.status = status
+        self.text = text
+
+
+class CircuitBreaker:
+    """
+    Fails fast once an upstream is clearly down.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests
+    are rejected for `reset_timeout` seconds. After that a single trial request is
+    let through; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=settings.BREAKER_FAILURE_THRESHOLD, reset_timeout=settings.BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow_request(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """A token bucket limiting retries to a fraction of successful requests."""
+
+    def __init__(self, ratio=settings.HTTP_RETRY_RATIO, maximum=settings.HTTP_RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = maximum
+
+    def deposit(self):
+        self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Upstream:
+    """
+    A pooled, keep-alive HTTP client for a single upstream service.
+
+    The underlying aiohttp session is created lazily on first use so it is bound
+    to the bot's running event loop. A semaphore bounds the number of concurrent
+    requests so a burst of commands overlaps instead of flooding the upstream.
+    Failed requests (network errors, timeouts and 5xx responses) are retried
+    within a retry budget, and a circuit breaker rejects requests outright once
+    the upstream is clearly down.
+    """
+
+    def __init__(self, name, max_concurrency=settings.HTTP_MAX_CONCURRENCY, connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+                 read_timeout=settings.HTTP_READ_TIMEOUT, total_timeout=settings.HTTP_TOTAL_TIMEOUT, max_retries=settings.HTTP_MAX_RETRIES):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.breaker = CircuitBreaker()
+        self.retry_budget = RetryBudget()
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _attempt(self, method, url, **kwargs):
+        session = self._get_session()
+        try:
+            async with self._semaphore:
+                async with session.request(method, url, **kwargs) as response:
+                    # Undecodable bytes (e.g. a wrong charset header) shouldn't fail the request
+                    text = await response.text(errors='replace')
+                    return UpstreamResponse(response.status, text)
+        except asyncio.TimeoutError as e:
+            raise UpstreamError(f"{self.name} timed out") from e
+        except aiohttp.ClientError as e:
+            raise UpstreamError(f"{self.name}: {e}") from e
+
+    async def request(self, method, url, **kwargs):
+        with metrics.phase('fetch'):
+            return await self._request(method, url, **kwargs)
+
+    async def _request(self, method, url, **kwargs):
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                metrics.UPSTREAM_REQUESTS.inc(self.name, 'circuit_open')
+                raise CircuitOpenError(f"{self.name} is unavailable")
+
+            try:
+                response = await self._attempt(method, url, **kwargs)
+            except UpstreamError as e:
+                response, error = None, e
+            except asyncio.CancelledError:
+                # Let another request take the half-open trial
+                self.breaker.release_trial()
+                raise
+            except Exception:
+                # Anything unexpected still counts against the breaker, so a
+                # half-open trial is never left claimed
+                metrics.UPSTREAM_REQUESTS.inc(self.name, 'error')
+                self.breaker.record_failure()
+                raise
+            else:
+                error = None
+
+            outcome = 'error' if error is not None else 'ok' if response.status < 500 else 'server_error'
+            metrics.UPSTREAM_REQUESTS.inc(self.name, outcome)
+
+            if error is None and response.status < 500:
+                self.breaker.record_success()
+                self.retry_budget.deposit()
+                return response
+
+            self.breaker.record_failure()
+            if attempt >= self.max_retries or not self.retry_budget.withdraw():
+                if error is not None:
+                    raise error
+                return response
+
+            # Full jitter keeps retries from many commands from synchronising
+            backoff = min(settings.HTTP_RETRY_BACKOFF_MAX, settings.HTTP_RETRY_BACKOFF * 2 ** attempt)
+            attempt += 1
+            logging.info(f"Retrying {self.name} request (attempt {attempt + 1})")
+            await asyncio.sleep(random.uniform(0, backoff))
+
+    def invalid_response(self, reason):
+        """
+        Records a response that arrived but couldn't be used (e.g. an HTML error page
+        instead of XML) as a failure, returning an UpstreamError for the caller to raise.
+        """
+        metrics.UPSTREAM_REQUESTS.inc(self.name, 'invalid')
+        self.breaker.record_failure()
+        return UpstreamError(f"{self.name} returned an invalid response: {reason}")
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Shared clients, one per upstream service
+NAIPS = Upstream('NAIPS')
+AVIATIONWEATHER = Upstream('aviationweather.gov')
+
+
+async def close_all():
+    for upstream in (NAIPS, AVIATIONWEATHER):
+        await upstream.close()
+    logging.info('Closed upstream HTTP sessions')
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import random
+import time
+
+
+class StationWatcher:
+    """
+    Periodically refreshes a fixed list of stations in the background.
+
+    Each cycle calls `refresh(station)` for every station concurrently. When a
+    station's new snapshot differs from the previous one (as decided by
+    `describe_changes`), `on_change(station, snapshot, changes)` is awaited.
+    Stations that fail are retried with capped exponential backoff, and each
+    cycle is jittered so the requests don't line up with other schedules.
+
+    If `expires_in()` is given (seconds until entries refreshed now expire from
+    the cache), the next cycle is brought forward to `refresh_lead` seconds before
+    that (but never sooner than half the interval, or 30 seconds), so watched stations are
+    refreshed before commands can miss the cache.
+    """
+
+    def __init__(self, stations, refresh, describe_changes, on_change,
+                 interval=300, jitter=0.1, max_backoff=1800, expires_in=None, refresh_lead=15):
+        self.stations = list(stations)
+        self.refresh = refresh
+        self.describe_changes = describe_changes
+        self.on_change = on_change
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.expires_in = expires_in
+        self.refresh_lead = refresh_lead
+        self.snapshots = {}
+        self._failures = {}
+        self._next_attempt = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None and self.stations:
+            self._task = asyncio.create_task(self._run())
+            logging.info(f"Watching stations: {', '.join(self.stations)}")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll_station(self, station):
+        now = time.monotonic()
+        if self._next_attempt.get(station, 0) > now:
+            return
+
+        try:
+            snapshot = await self.refresh(station)
+        except Exception as e:
+            failures = self._failures.get(station, 0) + 1
+            self._failures[station] = failures
+            backoff = min(self.interval * 2 ** failures, self.max_backoff)
+            self._next_attempt[station] = now + backoff
+            logging.warning(f"Failed to refresh {station} ({e}); retrying in {backoff:.0f}s")
+            return
+
+        self._failures.pop(station, None)
+        self._next_attempt.pop(station, None)
+        if snapshot is None:
+            return
+
+        previous = self.snapshots.get(station)
+        self.snapshots[station] = snapshot
+        if previous is None:
+            return
+
+        changes = self.describe_changes(previous, snapshot)
+        if changes:
+            try:
+                await self.on_change(station, snapshot, changes)
+            except Exception:
+                logging.exception(f"Failed to announce changes for {station}")
+
+    async def poll(self):
+        await asyncio.gather(*(self._poll_station(station) for station in self.stations))
+
+    def next_delay(self):
+        delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if self.expires_in is not None:
+            expires_in = self.expires_in()
+            # Entries that expire within the lead time (a very short cache TTL) can't be
+            # refreshed ahead of time, and polling faster wouldn't help
+            if expires_in > self.refresh_lead:
+                delay = min(delay, max(expires_in - self.refresh_lead, self.interval / 2, 30))
+        return delay
+
+    async def _run(self):
+        while True:
+            await self.poll()
+            await asyncio.sleep(self.next_delay())
@@ -0,0 +1,577 @@
+import re
+import json
+import time
+import asyncio
+import discord
+import metrics
+import settings
+import upstream
+from lazy import lazy_import
+from weather_cache import TTLCache, PersistentStore
+
+# The decoder and briefing parser are only loaded once weather is first requested
+decoder = lazy_import('decoder')
+briefing_parser = lazy_import('briefing')
+
+# Separators accepted between stations in multi-station metar/taf commands
+STATION_SEPARATORS = re.compile(r'[\s,\-]+')
+
+# Discord's limits on the length of embed descriptions and field values
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_FIELD_LIMIT = 1024
+# Discord's 6000 character limit on a whole embed, less some headroom
+EMBED_TOTAL_BUDGET = 5800
+# Allowance per station field for its name, stale notice and code block markers
+FIELD_OVERHEAD = 200
+# Briefing text per page, leaving room in the embed for notices and name substitution
+BRIEFING_PAGE_LIMIT = 3500
+
+# Embed colour for each flight rules category
+FLIGHT_RULES_COLORS = {
+    'VFR': discord.Color.green(),
+    'MVFR': discord.Color.blue(),
+    'IFR': discord.Color.red(),
+    'LIFR': discord.Color.purple(),
+}
+
+# Marker shown next to each station in multi-station replies
+FLIGHT_RULES_ICONS = {
+    'VFR': "🟢",
+    'MVFR': "🔵",
+    'IFR': "🔴",
+    'LIFR': "🟣",
+}
+
+def determine_flight_rules(report):
+    """
+    Returns the flight rules for a decoded METAR or TAF along with its embed colour.
+    """
+    flight_rules = report.flight_rules if report is not None else 'Unknown'
+    return flight_rules, FLIGHT_RULES_COLORS.get(flight_rules, discord.Color.default())
+
+def describe_taf_periods(taf):
+    """
+    Summarises the flight rules for each forecast period in a TAF, one per line.
+    """
+    lines = []
+    for change, effective in taf.periods():
+        if change.kind == 'NOSIG':
+            continue
+        label = "Base" if change.kind == 'BASE' else change.kind
+        period = f"{change.start}/{change.end}" if change.end else (change.start or "")
+        lines.append(f"• {label} {period}: {effective.flight_rules}")
+    return "\n".join(lines)
+
+def taf_description(taf_text):
+    """
+    Builds the TAF embed description and colour, with per-period flight rules.
+    """
+    with metrics.phase('parse'):
+        taf = decoder.decode_taf(taf_text)
+    flight_rules, color = determine_flight_rules(taf)
+
+    description = f"{taf_text}\n\nFlight Conditions: **{flight_rules}**"
+    worst = taf.worst_flight_rules
+    if worst != flight_rules:
+        description += f" (worst forecast: **{worst}**)"
+
+    periods = describe_taf_periods(taf)
+    if periods:
+        description += f"\n{periods}"
+
+    return description, color
+        
+def get_airservices_soap_request(station):
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+    <SOAP-ENV:Envelope
+        xmlns:ns0="http://schemas.xmlsoap.org/soap/envelope/"
+        xmlns:ns1="http://www.airservicesaustralia.com/naips/xsd"
+        xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+        xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+        <SOAP-ENV:Header/>
+        <ns0:Body>
+            <ns1:loc-brief-rqs password="{settings.AIRSERVICES_PASSWORD}" requestor="{settings.AIRSERVICES_USERNAME}" source="atis">
+                <ns1:loc>{station.upper()}</ns1:loc>
+                <ns1:flags met="true"/>
+            </ns1:loc-brief-rqs>
+        </ns0:Body>
+    </SOAP-ENV:Envelope>'''
+        
+async def request_airservices_briefing(station):
+    """
+    Requests a location briefing from NAIPS, bypassing the cache.
+
+    :param station: The ICAO code of the station (e.g. 'YSSY').
+    :return: A tuple of (HTTP status, parsed Briefing or None).
+    """
+    soap_request = get_airservices_soap_request(station.upper())
+    response = await upstream.NAIPS.post(
+        settings.AIRSERVICES_URL,
+        headers={
+            'Content-Type': 'text/xml; charset=utf-8',
+            'SOAPAction': ''
+        },
+        data=soap_request
+    )
+
+    if response.status != 200:
+        return response.status, None
+
+    # Extract the <content> tag and split it into sections once, so every
+    # command can reuse the same parsed briefing from the cache
+    with metrics.phase('parse'):
+        try:
+            content = briefing_parser.extract_content(response.text)
+        except briefing_parser.ET.ParseError as e:
+            # Not XML at all, such as a maintenance page served with a 200
+            raise upstream.NAIPS.invalid_response(e) from e
+        if content is None:
+            return response.status, None
+
+        briefing = briefing_parser.parse_briefing(content, station.upper())
+    briefing.fetched_at = time.time()
+    return response.status, briefing
+
+def briefing_cache_ttl():
+    """
+    Returns the TTL for a cached briefing, capped so an entry never outlives the
+    next METAR issue (on the hour and half hour) by more than the grace period.
+    """
+    now = time.time()
+    until_next_issue = settings.BRIEFING_ISSUE_CYCLE - (now % settings.BRIEFING_ISSUE_CYCLE) + settings.BRIEFING_ISSUE_GRACE
+    return min(settings.BRIEFING_CACHE_TTL, until_next_issue)
+
+async def fetch_airservices_briefing(station):
+    """
+    Returns a location briefing for the station, served from the shared cache when
+    possible. Concurrent requests for the same station share one NAIPS request.
+
+    :param station: The ICAO code of the station (e.g. 'YSSY').
+    :return: A tuple of (HTTP status, parsed Briefing or None).
+    """
+    station = station.upper()
+    return await briefing_cache.get_or_fetch(
+        station,
+        lambda: request_airservices_briefing(station),
+        ttl=briefing_cache_ttl,
+        cacheable=lambda result: result[0] == 200 and result[1] is not None,
+        stale_timeout=settings.STALE_TIMEOUT
+    )
+
+def stale_notice(fetched_at):
+    """
+    Returns a warning to prefix weather with when it is older than the cache TTL,
+    which only happens when it is being served stale because the upstream failed.
+    """
+    if fetched_at is None:
+        return ""
+
+    age = time.time() - fetched_at
+    if age <= settings.BRIEFING_CACHE_TTL:
+        return ""
+    return f"⚠️ Upstream unavailable — showing data retrieved {int(age // 60)} min ago.\n\n"
+
+async def refresh_watched_station(station):
+    """
+    Fetches a fresh briefing for a watched station and stores it in the cache, so
+    commands for the station are answered from memory.
+    """
+    status, briefing = await request_airservices_briefing(station)
+    if status != 200 or briefing is None:
+        raise upstream.UpstreamError(f"NAIPS returned HTTP {status} for {station}")
+
+    briefing_cache.set(station, (status, briefing), briefing_cache_ttl())
+    return briefing
+
+def describe_briefing_changes(previous, current):
+    """
+    Lists what changed between two briefings: a new ATIS information letter or a
+    newly issued METAR/SPECI.
+    """
+    changes = []
+    if current.atis_letter and current.atis_letter != previous.atis_letter:
+        changes.append(f"ATIS information {current.atis_letter}")
+
+    latest = current.latest_metar
+    previous_latest = previous.latest_metar
+    if latest and (previous_latest is None or latest.text != previous_latest.text):
+        changes.append(f"New {latest.kind}")
+
+    return changes
+
+def is_australian_station(station):
+    return station.lower().startswith('y') and len(station) == 4
+
+def parse_station_list(args):
+    """
+    Splits command arguments into a de-duplicated list of station codes. Stations
+    may be separated by spaces, commas or dashes (e.g. 'YMML-YSCB-YSSY').
+    """
+    stations = []
+    for arg in args:
+        for station in STATION_SEPARATORS.split(arg.upper()):
+            if station and station not in stations:
+                stations.append(station)
+    return stations
+
+def split_aviationweather_reports(product, text):
+    """
+    Splits a raw aviationweather.gov response into one report per station. METARs
+    are one per line; TAF change groups are indented under their TAF line.
+    """
+    blocks = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if product == 'taf' and line[0].isspace() and blocks:
+            blocks[-1].append(line)
+        else:
+            blocks.append([line])
+
+    reports = {}
+    for block in blocks:
+        report = "\n".join(block)
+        decoded = decoder.decode_taf(report) if product == 'taf' else decoder.decode_metar(report)
+        # The most recent report for each station comes first
+        if decoded.station and decoded.station not in reports:
+            reports[decoded.station] = report
+    return reports
+
+async def request_aviationweather_reports(product, stations):
+    """
+    Requests METARs or TAFs for several stations from aviationweather.gov in one
+    request, caching each report. Falls back to stale reports if the request fails.
+
+    :return: A tuple of (HTTP status, dict of station to (raw report, fetch time)).
+    """
+    try:
+        response = await upstream.AVIATIONWEATHER.get(
+            f'{settings.AVIATIONWEATHER_URL}/{product}',
+            params={'ids': ",".join(stations), 'format': 'raw'}
+        )
+    except upstream.UpstreamError:
+        response = None
+
+    # aviationweather.gov answers 204 when none of the stations have data
+    if response is not None and response.status == 204:
+        return 200, {}
+
+    if response is None or response.status != 200:
+        # Fall back to the last good reports for stations we have them for
+        stale = {station: report_cache.get_stale((product, station)) for station in stations}
+        stale = {station: report for station, report in stale.items() if report is not None}
+        if stale:
+            report_cache.stale_hits += len(stale)
+            return 200, stale
+        if response is None:
+            raise upstream.UpstreamError(f"{upstream.AVIATIONWEATHER.name} is unavailable")
+        return response.status, {}
+
+    ttl = briefing_cache_ttl()
+    fetched_at = time.time()
+    with metrics.phase('parse'):
+        fetched_reports = split_aviationweather_reports(product, response.text)
+    reports = {}
+    for station, report in fetched_reports.items():
+        report_cache.set((product, station), (report, fetched_at), ttl)
+        reports[station] = (report, fetched_at)
+    return 200, reports
+
+# aviationweather.gov requests in flight, by (product, station), so concurrent
+# commands for the same stations share one request instead of repeating it
+aviationweather_in_flight = {}
+
+async def fetch_aviationweather_reports(product, stations):
+    """
+    Returns raw METAR or TAF text from aviationweather.gov for several stations,
+    fetching every station that isn't already cached or being fetched in a single request.
+
+    :param product: Either 'metar' or 'taf'.
+    :param stations: A list of ICAO codes (e.g. ['KSFO', 'KOAK']).
+    :return: A tuple of (HTTP status, dict of station to (raw report, fetch time)).
+    """
+    reports = {}
+    missing = []
+    pending = set()
+    for station in stations:
+        cached = report_cache.get((product, station))
+        if cached is not None:
+            reports[station] = cached
+        elif (product, station) in aviationweather_in_flight:
+            pending.add(aviationweather_in_flight[(product, station)])
+        else:
+            missing.append(station)
+
+    if missing:
+        task = asyncio.ensure_future(request_aviationweather_reports(product, missing))
+        for station in missing:
+            aviationweather_in_flight[(product, station)] = task
+
+        def _done(finished):
+            for station in missing:
+                if aviationweather_in_flight.get((product, station)) is finished:
+                    del aviationweather_in_flight[(product, station)]
+
+        task.add_done_callback(_done)
+        pending.add(task)
+
+    if not pending:
+        return 200, reports
+
+    # Shield so one caller being cancelled doesn't cancel a shared request
+    results = await asyncio.gather(*(asyncio.shield(task) for task in pending), return_exceptions=True)
+    status = 200
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+        task_status, task_reports = result
+        if task_status != 200:
+            status = task_status
+        reports.update((station, report) for station, report in task_reports.items() if station in stations)
+
+    return status, reports
+
+async def fetch_station_reports(product, stations):
+    """
+    Fetches METAR or TAF text for a mix of stations, fanning Australian stations
+    out to NAIPS concurrently alongside one aviationweather.gov batch request.
+
+    :return: A dict of station to (raw report, fetch time), or None where it couldn't be retrieved.
+    """
+    australian = [station for station in stations if is_australian_station(station)]
+    others = [station for station in stations if not is_australian_station(station)]
+
+    naips_results, aviationweather_result = await asyncio.gather(
+        asyncio.gather(*(fetch_airservices_briefing(station) for station in australian), return_exceptions=True),
+        fetch_aviationweather_reports(product, others) if others else asyncio.sleep(0, result=(200, {})),
+        return_exceptions=True
+    )
+
+    reports = dict.fromkeys(stations)
+
+    for station, result in zip(australian, naips_results):
+        if isinstance(result, Exception) or result[1] is None:
+            continue
+        briefing = result[1]
+        if product == 'taf' and briefing.taf_text:
+            reports[station] = (briefing.taf_text, briefing.fetched_at)
+        elif product == 'metar' and briefing.latest_metar:
+            reports[station] = (briefing.latest_metar.text, briefing.fetched_at)
+
+    if not isinstance(aviationweather_result, Exception):
+        reports.update(aviationweather_result[1])
+
+    return reports
+
+def truncate(text, limit):
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def station_table_embed(product, stations, reports):
+    """
+    Renders METARs or TAFs for several stations as one embed, with a field per
+    station marked with its flight rules. The embed colour follows the worst station.
+    """
+    embed = discord.Embed(title=f"{product.upper()} for {', '.join(stations)}")
+    headline_rules = []
+    # Share the embed's total length between the stations, as well as capping each field
+    report_limit = min(EMBED_FIELD_LIMIT, (EMBED_TOTAL_BUDGET - len(embed.title)) // max(len(stations), 1)) - FIELD_OVERHEAD
+
+    for station in stations:
+        if not reports.get(station):
+            embed.add_field(name=f"⚪ {station}", value="No data available.", inline=False)
+            continue
+
+        report, fetched_at = reports[station]
+        with metrics.phase('parse'):
+            if product == 'taf':
+                taf = decoder.decode_taf(report)
+                flight_rules = taf.flight_rules
+                worst = taf.worst_flight_rules
+                label = f"{flight_rules} (worst {worst})" if worst != flight_rules else flight_rules
+                headline_rules.append(worst)
+            else:
+                flight_rules = decoder.decode_metar(report).flight_rules
+                label = flight_rules
+                headline_rules.append(flight_rules)
+
+        icon = FLIGHT_RULES_ICONS.get(flight_rules, "⚪")
+        notice = stale_notice(fetched_at)
+        embed.add_field(
+            name=f"{icon} {station} — {label}",
+            value=f"{notice}```{truncate(report, report_limit)}```",
+            inline=False
+        )
+
+    worst = decoder.worst_flight_rules(headline_rules)
+    embed.color = FLIGHT_RULES_COLORS.get(worst, discord.Color.default())
+    return embed
+
+async def fetch_route_reports(stations):
+    """
+    Fetches METARs and TAFs for every station on a route at once. Australian
+    stations need one NAIPS briefing for both products (shared through the
+    briefing cache); the rest take one aviationweather.gov request per product.
+
+    :return: A tuple of (METAR reports, TAF reports), as returned by fetch_station_reports.
+    """
+    return await asyncio.gather(
+        fetch_station_reports('metar', stations),
+        fetch_station_reports('taf', stations)
+    )
+
+def route_embed(stations, metars, tafs):
+    """
+    Renders a route summary with a field per station giving its current (METAR) and
+    forecast worst (TAF) flight rules, headed by the worst conditions on the route.
+    """
+    embed = discord.Embed(title=f"Route {' → '.join(stations)}")
+    # Leave room for the summary description, and share the rest between the stations
+    report_limit = min(EMBED_FIELD_LIMIT, (EMBED_TOTAL_BUDGET - len(embed.title) - 300) // max(len(stations), 1)) - FIELD_OVERHEAD
+    station_rules = {}
+    missing = []
+
+    for station in stations:
+        metar, taf = metars.get(station), tafs.get(station)
+        if not metar and not taf:
+            missing.append(station)
+            embed.add_field(name=f"⚪ {station}", value="No data available.", inline=False)
+            continue
+
+        with metrics.phase('parse'):
+            current = decoder.decode_metar(metar[0]).flight_rules if metar else 'Unknown'
+            forecast = decoder.decode_taf(taf[0]).worst_flight_rules if taf else 'Unknown'
+        station_worst = station_rules[station] = decoder.worst_flight_rules([current, forecast])
+
+        fetched = [report[1] for report in (metar, taf) if report and report[1] is not None]
+        notice = stale_notice(min(fetched) if fetched else None)
+        raw = metar[0] if metar else "No METAR available."
+        embed.add_field(
+            name=f"{FLIGHT_RULES_ICONS.get(station_worst, '⚪')} {station} — now {current}, forecast worst {forecast}",
+            value=f"{notice}```{truncate(raw, report_limit)}```",
+            inline=False
+        )
+
+    worst_rules = decoder.worst_flight_rules(station_rules.values())
+    worst_at = [station for station, rules in station_rules.items() if rules == worst_rules != 'Unknown']
+    if worst_at:
+        embed.description = f"Worst conditions on route: **{worst_rules}** at {', '.join(worst_at)}"
+    else:
+        embed.description = "No weather available for this route."
+    if missing and worst_at:
+        embed.description += f"\nNo data for {', '.join(missing)}."
+    embed.description += "\n\nNOTE: Not for flight planning purposes. Simulation use only."
+    embed.color = FLIGHT_RULES_COLORS.get(worst_rules, discord.Color.default())
+    return embed
+
+def plan_briefing_pages(briefing, limit=BRIEFING_PAGE_LIMIT):
+    """
+    Splits a briefing into pages of at most `limit` characters. Sections are kept
+    together where they fit (METAR/SPECI, TAF, ATIS, then NOTAMs) and longer ones
+    are broken between lines.
+
+    Pages hold references to the briefing's lines rather than joined text, so
+    planning is cheap and each page is only formatted when it is shown.
+
+    :return: A list of (label, lines) tuples, label naming the sections on the page.
+    """
+    sections = [
+        ("Briefing", briefing.other),
+        ("METAR/SPECI", briefing.metars),
+        ("TAF", [briefing.taf] if briefing.taf else []),
+        ("ATIS", [briefing.atis] if briefing.atis else []),
+        ("NOTAMs", briefing.notams),
+    ]
+
+    pages = []
+    labels, lines, size = [], [], 0
+
+    def new_page():
+        nonlocal labels, lines, size
+        if any(line.strip() for line in lines):
+            pages.append((", ".join(labels), lines))
+        labels, lines, size = [], [], 0
+
+    for label, group in sections:
+        for section in group:
+            section_size = sum(len(line) + 1 for line in section.lines)
+            # Start sections on a fresh page rather than splitting them, where they fit on one
+            if lines and size + section_size > limit:
+                new_page()
+            for line in section.lines:
+                # A line longer than a page (unlikely, but not impossible) is cut up
+                for start in range(0, max(len(line), 1), limit):
+                    chunk = line[start:start + limit]
+                    if lines and size + len(chunk) + 1 > limit:
+                        new_page()
+                    if label not in labels:
+                        labels.append(label)
+                    lines.append(chunk)
+                    size += len(chunk) + 1
+    new_page()
+
+    return pages or [("Briefing", [briefing.text[:limit]])]
+
+def render_briefing_page(station, briefing, pages, index, display_name):
+    """Formats a single page of a briefing planned by plan_briefing_pages as an embed."""
+    label, lines = pages[index]
+    text = "\n".join(lines).strip()
+    # Replace AIRSERVICES_USERNAME with the user's display name
+    if settings.AIRSERVICES_USERNAME:
+        text = text.replace(settings.AIRSERVICES_USERNAME, display_name)
+
+    title = f"Location Briefing for {station.upper()}"
+    if len(pages) > 1:
+        title += f" — {label}"
+    embed = discord.Embed(
+        title=title,
+        description=stale_notice(briefing.fetched_at) + "NOTE: Not for flight planning purposes. Simulation use only.\n\n" + text,
+        color=discord.Color.orange()
+    )
+    if len(pages) > 1:
+        embed.set_footer(text=f"Page {index + 1} of {len(pages)}")
+    return embed
+
+# On-disk copy of the weather caches so a restart doesn't start cold
+store = PersistentStore(settings.WEATHER_CACHE_PATH, retention=settings.STALE_TTL) if settings.WEATHER_CACHE_PATH else None
+
+def dump_briefing(result):
+    status, briefing = result
+    return json.dumps({'station': briefing.station, 'text': briefing.text, 'fetched_at': briefing.fetched_at})
+
+def load_briefing(value):
+    data = json.loads(value)
+    briefing = briefing_parser.parse_briefing(data['text'], data['station'])
+    briefing.fetched_at = data.get('fetched_at')
+    return 200, briefing
+
+def load_report(value):
+    return tuple(json.loads(value))
+
+# Shared per-station briefing cache used by brief, metar, taf and atis
+briefing_cache = TTLCache(
+    max_entries=settings.BRIEFING_CACHE_SIZE, ttl=settings.BRIEFING_CACHE_TTL, stale_ttl=settings.STALE_TTL,
+    store=store, namespace='briefing', dumps=dump_briefing, loads=load_briefing
+)
+# Raw aviationweather.gov METARs/TAFs, keyed by (product, station)
+report_cache = TTLCache(
+    max_entries=settings.BRIEFING_CACHE_SIZE * 2, ttl=settings.BRIEFING_CACHE_TTL, stale_ttl=settings.STALE_TTL,
+    store=store, namespace='report', dumps=json.dumps, loads=load_report
+)
+
+metrics.registry.register(metrics.Collected(
+    'bot_cache_requests_total', "Weather cache lookups, by cache and result.", ('cache', 'result'),
+    lambda: {
+        (name, result): getattr(cache, result)
+        for name, cache in (('briefing', briefing_cache), ('report', report_cache))
+        for result in ('hits', 'misses', 'stale_hits')
+    },
+    kind='counter'
+))
+metrics.registry.register(metrics.Collected(
+    'bot_upstream_circuit_open', "Whether an upstream's circuit breaker is open.", ('upstream',),
+    lambda: {(client.name,): int(client.breaker.state == 'open') for client in (upstream.NAIPS, upstream.AVIATIONWEATHER)}
+))
+
+def close():
+    if store is not None:
+        store.close()
@@ -0,0 +1,235 @@
+import os
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class PersistentStore:
+    """
+    A small SQLite-backed key/value store with wall-clock expiry, used to keep
+    cached weather across restarts. The database is opened lazily on first use
+    and rows more than `retention` seconds past expiry are pruned at that point.
+    """
+
+    def __init__(self, path, retention=0):
+        self.path = path
+        self.retention = retention
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            self._connection.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time() - self.retention,))
+        return self._connection
+
+    def load(self, namespace, key):
+        """
+        Returns (value, seconds remaining) for an entry within its retention period,
+        or None. The seconds remaining are negative once the entry has expired.
+        """
+        try:
+            row = self._connect().execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Weather cache read failed: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        value, expires_at = row
+        remaining = expires_at - time.time()
+        return (value, remaining) if remaining > -self.retention else None
+
+    def save(self, namespace, key, value, ttl):
+        try:
+            self._connect().execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                (namespace, key, value, time.time() + ttl)
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Weather cache write failed: {e}")
+
+    def delete(self, namespace, key):
+        try:
+            self._connect().execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+        except sqlite3.Error as e:
+            logging.warning(f"Weather cache delete failed: {e}")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class TTLCache:
+    """
+    A bounded LRU cache whose entries expire after a time-to-live.
+
+    `get_or_fetch` coalesces concurrent misses for the same key, so ten users
+    asking for the same station at once share a single upstream request.
+
+    If a PersistentStore is given, entries are also written to it (using `dumps`
+    to turn a value into text) and misses fall back to it (using `loads`), so
+    still-valid entries survive a restart.
+
+    Expired entries are kept for a further `stale_ttl` seconds so the last good
+    value can be served while the upstream is slow or unavailable.
+    """
+
+    def __init__(self, max_entries=256, ttl=120, stale_ttl=0, store=None, namespace=None, dumps=str, loads=str):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.store = store
+        self.namespace = namespace
+        self.dumps = dumps
+        self.loads = loads
+        self._entries = OrderedDict()  # key -> (expires_at, stale_until, value)
+        self._in_flight = {}  # key -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _store_key(key):
+        return "|".join(key) if isinstance(key, tuple) else str(key)
+
+    def _load(self, key):
+        row = self.store.load(self.namespace, self._store_key(key))
+        if row is None:
+            return None
+
+        value, remaining = row
+        try:
+            value = self.loads(value)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable cache entry {key}: {e}")
+            return None
+
+        self._remember(key, value, remaining)
+        return value if remaining > 0 else None
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._load(key) if self.store is not None else None
+
+        expires_at, stale_until, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            # Keep expired entries around while they can still be served stale
+            if stale_until <= now:
+                del self._entries[key]
+            return None
+
+        # Mark as most recently used
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key):
+        """Returns the value for `key` even if it has expired, as long as it is within the stale period."""
+        if key not in self._entries and self.store is not None:
+            self._load(key)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        _, stale_until, value = entry
+        if stale_until <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._remember(key, value, ttl)
+        if self.store is not None:
+            self.store.save(self.namespace, self._store_key(key), self.dumps(value), ttl)
+
+    def _remember(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl
+        self._entries[key] = (expires_at, expires_at + self.stale_ttl, value)
+        self._entries.move_to_end(key)
+
+        # Evict the least recently used entries once over capacity
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        if self.store is not None:
+            self.store.delete(self.namespace, self._store_key(key))
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_fetch(self, key, fetch, ttl=None, cacheable=lambda value: value is not None, stale_timeout=None):
+        """
+        Returns the cached value for `key`, or awaits `fetch()` to populate it.
+
+        If a stale value is available it is returned instead when the fetch fails,
+        produces an uncacheable value, or takes longer than `stale_timeout` seconds.
+        In the last case the fetch carries on in the background to refresh the cache.
+
+        :param key: The cache key (e.g. 'YSSY').
+        :param fetch: A zero-argument coroutine function producing the value.
+        :param ttl: Optional TTL override (seconds) for this entry, or a function returning one.
+        :param cacheable: Predicate deciding whether the fetched value should be stored.
+        :param stale_timeout: How long to wait for the fetch before serving a stale value.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+
+        # Join an in-flight request for the same key if there is one
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+
+            def _done(finished):
+                self._in_flight.pop(key, None)
+                if not finished.cancelled() and finished.exception() is None:
+                    result = finished.result()
+                    if cacheable(result):
+                        self.set(key, result, ttl() if callable(ttl) else ttl)
+
+            task.add_done_callback(_done)
+
+        # Shield so one caller being cancelled doesn't cancel the shared request
+        shared = asyncio.shield(task)
+        stale = self.get_stale(key) if self.stale_ttl else None
+        if stale is None:
+            return await shared
+
+        try:
+            result = await asyncio.wait_for(shared, stale_timeout)
+        except Exception:
+            # Timed out or failed: serve the last good value instead
+            self.stale_hits += 1
+            return stale
+
+        if not cacheable(result):
+            self.stale_hits += 1
+            return stale
+        return result
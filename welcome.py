@@ -0,0 +1,86 @@
+import os
+import asyncio
+import logging
+import time
+from collections import deque
+
+
+class WelcomeTemplate:
+    """
+    The welcome message, read from disk once and reloaded only when the file's
+    modification time changes. The file is checked at most every `check_interval`
+    seconds.
+    """
+
+    def __init__(self, path, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self._text = None
+        self._mtime = None
+        self._checked_at = 0
+
+    def get(self):
+        now = time.monotonic()
+        if self._text is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime != self._mtime:
+                    with open(self.path, "r") as file:
+                        self._text = file.read()
+                    self._mtime = mtime
+                    logging.info(f"Loaded welcome message from {self.path}")
+            except OSError as e:
+                # Keep welcoming with the last good message (or none) rather than failing
+                logging.warning(f"Could not read welcome message {self.path}: {e}")
+        return self._text or ""
+
+
+class JoinBatcher:
+    """
+    Coalesces welcomes during join bursts.
+
+    Joins are welcomed individually until more than `threshold` members join a
+    guild within `window` seconds. After that, further joins are queued and
+    flushed together once per window through `send_batch(guild, members)`, so a
+    burst costs one message per window instead of one per member.
+    """
+
+    def __init__(self, send_single, send_batch, window=10, threshold=5):
+        self.send_single = send_single
+        self.send_batch = send_batch
+        self.window = window
+        self.threshold = threshold
+        self._recent = {}  # guild id -> deque of join times
+        self._pending = {}  # guild id -> list of members awaiting a batched welcome
+        self._flushes = set()  # scheduled flush tasks, referenced so they aren't garbage collected
+
+    def _in_burst(self, guild_id, now):
+        recent = self._recent.setdefault(guild_id, deque())
+        recent.append(now)
+        while recent and recent[0] <= now - self.window:
+            recent.popleft()
+        return len(recent) > self.threshold
+
+    async def add(self, member):
+        guild_id = member.guild.id
+        if not self._in_burst(guild_id, time.monotonic()) and guild_id not in self._pending:
+            await self.send_single(member)
+            return
+
+        pending = self._pending.get(guild_id)
+        if pending is None:
+            pending = self._pending[guild_id] = []
+            task = asyncio.create_task(self._flush_later(member.guild))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        pending.append(member)
+
+    async def _flush_later(self, guild):
+        await asyncio.sleep(self.window)
+        members = self._pending.pop(guild.id, [])
+        if members:
+            try:
+                await self.send_batch(guild, members)
+            except Exception:
+                logging.exception(f"Failed to send batched welcome for {len(members)} members")